@@ -1,10 +1,19 @@
 from . import utils
 from . import constants
+from . import gazetteer
+from . import instrument
+from . import models
 from .resume_parser import ResumeParser
 from .rank_by_edu import ResumeRank
+from .workers import WorkerPool
 
 __all__ = [
     'utils',
     'constants',
-    'ResumeParser'
+    'gazetteer',
+    'instrument',
+    'models',
+    'ResumeParser',
+    'ResumeRank',
+    'WorkerPool'
 ]
@@ -0,0 +1,188 @@
+'''
+asyncio API for parsing resumes from async code (e.g. web upload
+handlers). PDF and NLP work runs in the shared warm worker pool, so the
+event loop is never blocked.
+'''
+import asyncio
+import io
+from functools import partial
+from . import instrument
+from . import workers
+from .resume_parser import ResumeParser
+from .utils import jsonable
+
+# default number of documents parsed at the same time
+MAX_CONCURRENCY = None  # pool size
+
+_DEFAULT = None
+
+
+def parse_upload(data, name, options):
+    '''
+    Worker function: parse the bytes of an uploaded file.
+
+    :param data: content of the file
+    :param name: file name, used for its extension
+    :param options: `ResumeParser` options
+    :return: tuple of (extracted data with spans as strings, seconds per
+             stage, bytes per stage or None), the timings are sent to
+             the metrics sinks by the parent process
+    '''
+    stream = io.BytesIO(data)
+    stream.name = name
+    with instrument.muted():
+        parser = ResumeParser(stream, **options)
+    return (jsonable(parser.get_extracted_data()), parser.get_timings(),
+            parser.get_allocations())
+
+
+def _read(path):
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+def _set_result(future, result):
+    if not future.done():
+        future.set_result(result)
+
+
+def _set_exception(future, error):
+    if not future.done():
+        future.set_exception(error)
+
+
+def _release(semaphore, future):
+    semaphore.release()
+    if not future.cancelled():
+        # retrieved, so an error nobody waits for anymore is not logged
+        future.exception()
+
+
+def _call_in_loop(loop, callback, future, value):
+    '''
+    Hand the outcome of a pool job to the event loop. Runs in the result
+    thread of the pool, so it must never raise: that would stop the
+    thread and every later job of the pool would never complete.
+    '''
+    if loop.is_closed():
+        return
+    try:
+        loop.call_soon_threadsafe(callback, future, value)
+    except RuntimeError:
+        # the loop was closed in the meantime
+        pass
+
+
+class AsyncResumeParser(object):
+    '''
+    Parse resumes from coroutines with a concurrency limit and an
+    optional timeout per document.
+
+    A cancelled or timed out document keeps its slot until its job is
+    done, since a job already queued or running in a worker is not
+    interrupted; its result is dropped when it finishes. The limit so
+    always bounds the jobs in the pool, not only the waiting coroutines.
+    '''
+
+    def __init__(self, pool=None, max_concurrency=MAX_CONCURRENCY,
+                 timeout=None, **options):
+        '''
+        :param pool: `workers.WorkerPool`, the shared pool if None
+        :param max_concurrency: documents in flight at once, pool size
+                                if None
+        :param timeout: default seconds allowed per document
+        :param options: `ResumeParser` options (skills_file, ...)
+        '''
+        self.pool = pool or workers.get_pool()
+        self.max_concurrency = max_concurrency or self.pool.processes
+        self.timeout = timeout
+        self.options = options
+        self.__semaphore = None
+
+    @property
+    def semaphore(self):
+        '''
+        Concurrency limit, created in the running event loop.
+        '''
+        if self.__semaphore is None:
+            self.__semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self.__semaphore
+
+    def __submit(self, data, name):
+        '''
+        Queue a job, with a future resolved in the running loop.
+        '''
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pool.pool.apply_async(
+            parse_upload, (data, name, self.options),
+            callback=lambda result: _call_in_loop(
+                loop, _set_result, future, result),
+            error_callback=lambda error: _call_in_loop(
+                loop, _set_exception, future, error))
+        return future
+
+    async def parse(self, resume, name=None, timeout=None):
+        '''
+        Parse one resume.
+
+        :param resume: `io.BytesIO` with a name, bytes, or file path
+        :param name: file name when `resume` is bytes
+        :param timeout: seconds allowed, the default timeout if None
+        :return: extracted data, with spans as strings
+        :raise asyncio.TimeoutError: when the timeout expires
+        :raise ValueError: when `resume` is bytes without a name
+        '''
+        if isinstance(resume, io.BytesIO):
+            data, name = resume.getvalue(), name or resume.name
+        elif isinstance(resume, (bytes, bytearray)):
+            if name is None:
+                raise ValueError('name is required to parse bytes')
+            data = bytes(resume)
+        else:
+            name = name or resume
+            # read in a thread, a slow disk never blocks the event loop
+            data = await asyncio.get_running_loop().run_in_executor(
+                None, _read, resume)
+        if timeout is None:
+            timeout = self.timeout
+        semaphore = self.semaphore
+        await semaphore.acquire()
+        try:
+            future = self.__submit(data, name)
+        except BaseException:
+            semaphore.release()
+            raise
+        # the slot is released when the job is done, not when we stop
+        # waiting for it
+        future.add_done_callback(partial(_release, semaphore))
+        data, timings, allocations = await asyncio.wait_for(
+            asyncio.shield(future), timeout)
+        instrument.emit(name, timings, allocations)
+        return data
+
+    async def parse_many(self, resumes, timeout=None):
+        '''
+        Parse several resumes concurrently.
+
+        :return: list of extracted data, or the exception raised, in
+                 input order
+        '''
+        return await asyncio.gather(
+            *(self.parse(resume, timeout=timeout) for resume in resumes),
+            return_exceptions=True)
+
+
+async def parse_async(resume, name=None, timeout=None):
+    '''
+    Parse one resume with a process-wide `AsyncResumeParser`.
+
+    :param resume: `io.BytesIO` with a name, bytes, or file path
+    :param name: file name when `resume` is bytes
+    :param timeout: seconds allowed for this document
+    :return: extracted data, with spans as strings
+    '''
+    global _DEFAULT
+    if _DEFAULT is None:
+        _DEFAULT = AsyncResumeParser()
+    return await _DEFAULT.parse(resume, name=name, timeout=timeout)
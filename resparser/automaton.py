@@ -0,0 +1,110 @@
+'''
+Aho-Corasick automaton for finding every dictionary entry contained in
+a text with one linear pass, instead of testing each entry with `in`.
+'''
+from bisect import bisect_right
+from collections import deque
+
+# joins sentences so that no pattern can match across two of them
+SEPARATOR = '\x00'
+
+
+class Automaton(object):
+    '''
+    Multi-pattern substring matcher. Patterns keep their position in the
+    input list, so hits can be reported in dictionary order.
+    '''
+
+    def __init__(self, patterns):
+        '''
+        :param patterns: iterable of strings, matched case-sensitively
+        '''
+        self.patterns = tuple(patterns)
+        self.__goto = [{}]
+        self.__fail = [0]
+        self.__out = [()]
+        for index, pattern in enumerate(self.patterns):
+            if pattern:
+                self.__add(pattern, index)
+        self.__build()
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def __add(self, pattern, index):
+        state = 0
+        for char in pattern:
+            nxt = self.__goto[state].get(char)
+            if nxt is None:
+                nxt = len(self.__goto)
+                self.__goto[state][char] = nxt
+                self.__goto.append({})
+                self.__fail.append(0)
+                self.__out.append(())
+            state = nxt
+        self.__out[state] += (index,)
+
+    def __build(self):
+        goto, fail, out = self.__goto, self.__fail, self.__out
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in goto[state].items():
+                queue.append(nxt)
+                link = fail[state]
+                while link and char not in goto[link]:
+                    link = fail[link]
+                link = goto[link].get(char, 0)
+                fail[nxt] = link if link != nxt else 0
+                out[nxt] += out[fail[nxt]]
+
+    def iter_matches(self, text):
+        '''
+        Iterate over all hits in the text.
+
+        :param text: string to scan
+        :return: iterator of (end position, pattern index)
+        '''
+        goto, fail, out = self.__goto, self.__fail, self.__out
+        state = 0
+        for pos, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in out[state]:
+                yield pos + 1, index
+
+    def search(self, text):
+        '''
+        Indices of all patterns contained in the text, in pattern order.
+        Same result as `[i for i, p in enumerate(patterns) if p in text]`
+        for non-empty patterns.
+        '''
+        return sorted({index for _, index in self.iter_matches(text)})
+
+    def first(self, text):
+        '''
+        First pattern, in pattern order, contained in the text, or None.
+        '''
+        found = self.search(text)
+        if found:
+            return self.patterns[found[0]]
+        return None
+
+    def search_many(self, texts):
+        '''
+        Scan several texts in a single pass. A pattern only matches inside
+        one text, never across two of them.
+
+        :param texts: list of strings
+        :return: list with the sorted pattern indices found in each text
+        '''
+        starts = []
+        pos = 0
+        for text in texts:
+            starts.append(pos)
+            pos += len(text) + len(SEPARATOR)
+        found = [set() for _ in texts]
+        for end, index in self.iter_matches(SEPARATOR.join(texts)):
+            found[bisect_right(starts, end - 1) - 1].add(index)
+        return [sorted(hits) for hits in found]
@@ -0,0 +1,432 @@
+'''
+Benchmark harness for the parser.
+
+    python -m resparser.benchmark --output benchmark.json
+
+Runs `ResumeParser` and `ResumeRank` over the resume folder and over a
+synthetic corpus of generated PDF and DOCX files of growing length, and
+reports cold start time, latency percentiles, docs/sec per number of
+workers and peak memory. A long generated PDF, above
+`pdf.PARALLEL_PAGE_THRESHOLD` pages, is read with and without page
+splitting. The JSON output can be compared across commits.
+'''
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from xml.sax.saxutils import escape
+from . import instrument
+from . import pdf
+from . import workers
+from .rank_by_edu import ResumeRank, iter_resume_files
+from .resume_parser import ResumeParser
+
+try:
+    import resource
+except ImportError:  # not on Windows
+    resource = None
+
+RESUME_DIR = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'resume')
+
+# lines per synthetic pdf page
+LINES_PER_PAGE = 50
+
+# pages of the long pdf, enough to be split across processes
+LONG_PAGES = 2 * pdf.PARALLEL_PAGE_THRESHOLD
+
+# reads of the long pdf per mode
+LONG_REPEAT = 3
+
+NAMES = ['Jane Miller', 'Wei Zhang', 'Carlos Ortega', 'Amara Okafor',
+         'Priya Sharma', 'Lukas Becker']
+UNIVERSITIES = ['Massachusetts Institute of Technology',
+                'Stanford University', 'University of Toronto',
+                'Tsinghua University', 'University of Michigan',
+                'National University of Singapore']
+DEGREES = ['Bachelor of Science in Computer Science',
+           'Master of Science in Electrical Engineering',
+           'PhD in Statistics', 'B.E. in Mechanical Engineering']
+TITLES = ['Software Engineer', 'Data Scientist', 'Project Manager',
+          'Machine Learning Engineer', 'Business Analyst']
+COMPANIES = ['Acme Corp', 'Globex Inc', 'Initech LLC', 'Umbrella Ltd']
+SKILLS = ['Python', 'SQL', 'Machine Learning', 'Java', 'Docker', 'Excel',
+          'Tableau', 'C++', 'Statistics', 'AWS', 'Linux', 'Git']
+DUTIES = ['Built data pipelines processing millions of records per day',
+          'Led a team of five engineers on the payments platform',
+          'Designed dashboards used by the sales organisation',
+          'Improved model accuracy by twelve percent',
+          'Migrated legacy services to containers on the cloud',
+          'Wrote unit and integration tests for the core libraries']
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep',
+          'Oct', 'Nov', 'Dec']
+
+
+def synthetic_lines(jobs, seed=0):
+    '''
+    Lines of a fake resume.
+
+    :param jobs: number of jobs in the experience section, sets the length
+    :param seed: seed of the random choices
+    :return: list of strings
+    '''
+    rnd = random.Random(seed)
+    name = rnd.choice(NAMES)
+    lines = [name,
+             name.lower().replace(' ', '.') + '@example.com',
+             f'+1 {rnd.randint(200, 999)} {rnd.randint(200, 999)} '
+             f'{rnd.randint(1000, 9999)}',
+             '',
+             'Education',
+             rnd.choice(DEGREES),
+             rnd.choice(UNIVERSITIES),
+             '',
+             'Experience']
+    year = 2020
+    for _ in range(jobs):
+        start = year - rnd.randint(1, 3)
+        lines += [f'{rnd.choice(TITLES)} at {rnd.choice(COMPANIES)}',
+                  f'{rnd.choice(MONTHS)} {start} - {rnd.choice(MONTHS)} '
+                  f'{year}']
+        lines += rnd.sample(DUTIES, 3)
+        lines.append('')
+        year = start
+    lines += ['Skills', ', '.join(rnd.sample(SKILLS, 6))]
+    return lines
+
+
+def _pdf_string(text):
+    return '(' + text.replace('\\', '\\\\').replace('(', '\\(').replace(
+        ')', '\\)') + ')'
+
+
+def write_pdf(lines, file_path):
+    '''
+    Write lines of text to a minimal pdf file, `LINES_PER_PAGE` per page.
+    '''
+    pages = [lines[i:i + LINES_PER_PAGE]
+             for i in range(0, len(lines), LINES_PER_PAGE)] or [[]]
+    # 1: catalog, 2: pages, 3: font, then a page and its content per page
+    kids = ' '.join(f'{4 + 2 * i} 0 R' for i in range(len(pages)))
+    objects = [
+        '<< /Type /Catalog /Pages 2 0 R >>',
+        f'<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>',
+        '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+    ]
+    for i, page in enumerate(pages):
+        stream = 'BT /F1 11 Tf 14 TL 50 800 Td\n' + ''.join(
+            f'{_pdf_string(line)} Tj T*\n' for line in page) + 'ET'
+        objects.append(
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] '
+            f'/Resources << /Font << /F1 3 0 R >> >> '
+            f'/Contents {5 + 2 * i} 0 R >>')
+        objects.append(f'<< /Length {len(stream.encode("latin-1"))} >>\n'
+                       f'stream\n{stream}\nendstream')
+
+    data = b'%PDF-1.4\n'
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(data))
+        data += f'{number} 0 obj\n{body}\nendobj\n'.encode('latin-1')
+    xref = len(data)
+    data += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode()
+    data += ''.join(f'{offset:010d} 00000 n \n' for offset in offsets).encode()
+    data += (f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n'
+             f'startxref\n{xref}\n%%EOF\n').encode()
+    with open(file_path, 'wb') as file:
+        file.write(data)
+
+
+def write_docx(lines, file_path):
+    '''
+    Write lines of text to a minimal docx file, one paragraph per line.
+    '''
+    namespace = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+    body = ''.join(f'<w:p><w:r><w:t>{escape(line)}</w:t></w:r></w:p>'
+                   for line in lines)
+    with zipfile.ZipFile(file_path, 'w', zipfile.ZIP_DEFLATED) as docx:
+        docx.writestr('[Content_Types].xml', (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/'
+            'content-types">'
+            '<Default Extension="rels" ContentType="application/'
+            'vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/word/document.xml" ContentType="'
+            'application/vnd.openxmlformats-officedocument.'
+            'wordprocessingml.document.main+xml"/></Types>'))
+        docx.writestr('_rels/.rels', (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/'
+            'package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.'
+            'org/officeDocument/2006/relationships/officeDocument" '
+            'Target="word/document.xml"/></Relationships>'))
+        docx.writestr('word/document.xml', (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            f'<w:document xmlns:w="{namespace}"><w:body>{body}'
+            '</w:body></w:document>'))
+
+
+def make_corpus(folder, sizes=(1, 5, 20), docs_per_size=4):
+    '''
+    Generate synthetic resumes, half pdf and half docx.
+
+    :param folder: folder to write to
+    :param sizes: numbers of jobs per resume, sets the length
+    :param docs_per_size: files generated per size
+    :return: list of file paths
+    '''
+    paths = []
+    for jobs in sizes:
+        for i in range(docs_per_size):
+            lines = synthetic_lines(jobs, seed=jobs * 1000 + i)
+            if i % 2:
+                file_path = os.path.join(folder, f'synthetic_{jobs}_{i}.docx')
+                write_docx(lines, file_path)
+            else:
+                file_path = os.path.join(folder, f'synthetic_{jobs}_{i}.pdf')
+                write_pdf(lines, file_path)
+            paths.append(file_path)
+    return paths
+
+
+def make_long_pdf(folder, pages=LONG_PAGES, seed=0):
+    '''
+    Generate a resume pdf of exactly `pages` pages, its experience
+    section repeated to fill them.
+
+    :return: file path
+    '''
+    lines = synthetic_lines(1, seed=seed)
+    jobs = 1
+    while len(lines) < pages * LINES_PER_PAGE:
+        jobs *= 2
+        lines = synthetic_lines(jobs, seed=seed)
+    file_path = os.path.join(folder, f'synthetic_long_{pages}.pdf')
+    write_pdf(lines[:pages * LINES_PER_PAGE], file_path)
+    return file_path
+
+
+def long_pdf(file_path, pages, repeat=LONG_REPEAT):
+    '''
+    Read a long pdf serially and split across processes, then parse it.
+
+    :return: dictionary of latency summaries per mode
+    '''
+    modes = {'read_serial': None,
+             'read_parallel': pdf.PARALLEL_PAGE_THRESHOLD}
+    report = {'pages': pages}
+    for mode, threshold in modes.items():
+        seconds = []
+        for _ in range(repeat):
+            start_time = time.perf_counter()
+            pdf.read_pdf(file_path, parallel_threshold=threshold)
+            seconds.append(time.perf_counter() - start_time)
+        report[mode] = latency_summary(seconds)
+    report['parse'] = parse_latency([file_path] * repeat)['latency']
+    return report
+
+
+def peak_rss():
+    '''
+    Peak resident memory in MB of this process and of its finished
+    children, None where `resource` is missing.
+    '''
+    if resource is None:
+        return None
+    # kilobytes on Linux, bytes on macOS
+    scale = 1 << 20 if sys.platform == 'darwin' else 1 << 10
+    return {
+        'self': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+        'children': resource.getrusage(
+            resource.RUSAGE_CHILDREN).ru_maxrss / scale,
+    }
+
+
+def latency_summary(seconds):
+    '''
+    Count, mean and percentiles of a list of durations.
+    '''
+    return {
+        'count': len(seconds),
+        'mean': sum(seconds) / len(seconds) if seconds else None,
+        'p50': instrument.percentile(seconds, 50),
+        'p95': instrument.percentile(seconds, 95),
+        'p99': instrument.percentile(seconds, 99),
+    }
+
+
+def cold_start(file_path):
+    '''
+    Time a fresh interpreter importing the package, loading the models
+    and parsing one resume.
+
+    :return: dictionary of seconds per step
+    '''
+    script = (
+        'import json, time\n'
+        'start = time.perf_counter()\n'
+        'from resparser import ResumeParser, gazetteer, models\n'
+        'imported = time.perf_counter()\n'
+        'models.warm_up()\n'
+        'gazetteer.warm_up()\n'
+        'loaded = time.perf_counter()\n'
+        f'ResumeParser({file_path!r}).get_extracted_data()\n'
+        'done = time.perf_counter()\n'
+        'print(json.dumps({"import": imported - start,'
+        ' "load": loaded - imported, "first_parse": done - loaded,'
+        ' "total": done - start}))\n')
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run([sys.executable, '-c', script], cwd=root,
+                            check=True, stdout=subprocess.PIPE).stdout
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def parse_latency(file_paths):
+    '''
+    Parse files one by one in this process (models already warm).
+
+    :return: dictionary of latency and per-stage summaries, and the
+             seconds of each file
+    '''
+    latencies = []
+    timings = []
+    for file_path in file_paths:
+        start_time = time.perf_counter()
+        parser = ResumeParser(file_path)
+        latencies.append(time.perf_counter() - start_time)
+        timings.append(parser.get_timings())
+    return {'latency': latency_summary(latencies),
+            'stages': instrument.summarize(timings),
+            'seconds': latencies}
+
+
+def rank_throughput(folder, worker_counts):
+    '''
+    Rank a folder with `ResumeRank` and a warm pool of each size.
+
+    :return: dictionary of worker count to docs/sec
+    '''
+    docs = sum(1 for _ in iter_resume_files(folder, recursive=False))
+    results = {}
+    for processes in worker_counts:
+        with workers.WorkerPool(processes) as pool:
+            pool.map(abs, range(processes))  # start and warm the workers
+            ranking = ResumeRank(res_path=os.path.join(folder, ''),
+                                 pool=pool)
+            start_time = time.perf_counter()
+            ranking.run()
+            seconds = time.perf_counter() - start_time
+        results[processes] = {
+            'docs': docs,
+            'seconds': seconds,
+            'docs_per_sec': docs / seconds if seconds else None,
+            'latency': latency_summary(
+                [timing[instrument.TOTAL] for timing in ranking.timings]),
+        }
+    return results
+
+
+def git_commit():
+    '''
+    Current git commit of the repository, None outside of git.
+    '''
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], check=True, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(resume_dir=RESUME_DIR, sizes=(1, 5, 20), docs_per_size=4,
+        worker_counts=(1, 2, 4), cold=True, long_pages=LONG_PAGES):
+    '''
+    Run the whole benchmark.
+
+    :param resume_dir: folder of real resumes, skipped if None
+    :param sizes: numbers of jobs per synthetic resume
+    :param docs_per_size: synthetic files per size
+    :param worker_counts: pool sizes for the throughput runs
+    :param cold: also measure cold start in a fresh interpreter
+    :param long_pages: pages of the long pdf, skipped if 0 or None
+    :return: dictionary of results
+    '''
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    folder = tempfile.mkdtemp(prefix='resparser-benchmark-')
+    try:
+        synthetic = make_corpus(folder, sizes, docs_per_size)
+        corpora = {'synthetic': (folder, synthetic)}
+        if resume_dir:
+            corpora['resume'] = (resume_dir, [
+                os.path.join(resume_dir, name)
+                for name in iter_resume_files(resume_dir, recursive=False)])
+        if cold:
+            report['cold_start'] = cold_start(synthetic[0])
+        for name, (path, file_paths) in corpora.items():
+            report[name] = parse_latency(file_paths)
+            report[name]['throughput'] = rank_throughput(path, worker_counts)
+            seconds = report[name].pop('seconds')
+            if name != 'synthetic':
+                continue
+            # files of make_corpus are grouped by size
+            report[name]['by_size'] = {
+                jobs: latency_summary(
+                    seconds[i * docs_per_size:(i + 1) * docs_per_size])
+                for i, jobs in enumerate(sizes)}
+        if long_pages:
+            # outside the corpus folder, not part of the throughput runs
+            long_folder = os.path.join(folder, 'long')
+            os.mkdir(long_folder)
+            report['long_pdf'] = long_pdf(
+                make_long_pdf(long_folder, long_pages), long_pages)
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    report['peak_rss_mb'] = peak_rss()
+    return report
+
+
+def main():
+    '''
+    Main function.
+    '''
+    args = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    args.add_argument('--resume-dir', default=RESUME_DIR,
+                      help='folder of real resumes, "" to skip')
+    args.add_argument('--sizes', type=int, nargs='+', default=[1, 5, 20],
+                      help='jobs per synthetic resume, sets the length')
+    args.add_argument('--docs-per-size', type=int, default=4)
+    args.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4],
+                      help='pool sizes for the throughput runs')
+    args.add_argument('--no-cold-start', action='store_true')
+    args.add_argument('--long-pages', type=int, default=LONG_PAGES,
+                      help='pages of the long pdf read with and without '
+                           'page splitting, 0 to skip')
+    args.add_argument('--output', default='benchmark.json')
+    args = args.parse_args()
+
+    report = run(args.resume_dir or None, args.sizes, args.docs_per_size,
+                 args.workers, not args.no_cold_start, args.long_pages)
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
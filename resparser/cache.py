@@ -0,0 +1,217 @@
+'''
+Content-addressed cache of parsed resumes, stored in a local SQLite file.
+
+Results are keyed by the hash of the file content plus the versions of
+the parser, the models, the gazetteers and the parser options, so a
+cached result is never used for a different configuration. The text
+extracted from a file only depends on its content and is cached on its
+own, so changing options does not repeat the PDF work.
+'''
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+from . import models
+from .gazetteer import get_gazetteer
+from .utils import Document
+
+# bump when the extraction logic changes the output
+CACHE_VERSION = 2
+
+DEFAULT_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'resparser',
+                            'results.sqlite')
+
+TEXT = 'text'
+DATA = 'data'
+
+
+def content_hash(resume):
+    '''
+    Helper function to hash the content of a resume.
+
+    :param resume: file path or `io.BytesIO`
+    :return: hex digest string
+    '''
+    sha = hashlib.sha256()
+    if isinstance(resume, io.BytesIO):
+        sha.update(resume.getbuffer())
+    else:
+        with open(resume, 'rb') as file:
+            for chunk in iter(lambda: file.read(1 << 20), b''):
+                sha.update(chunk)
+    return sha.hexdigest()
+
+
+def options_key(nlp=None, custom_nlp=None, skills_file=None, **options):
+    '''
+    Helper function to describe everything besides the file content
+    that changes the parser output.
+
+    :param nlp: `spacy.language.Language` used, registry default if None
+    :param custom_nlp: custom NER model used, registry default if None
+    :param skills_file: path of a custom skills csv
+    :param options: other parser options, e.g. single_pass or fields
+    :return: string
+    '''
+    parts = [
+        f'v{CACHE_VERSION}',
+        models.model_version(
+            models.DEFAULT_MODEL if nlp is None else nlp),
+        models.model_version(
+            models.CUSTOM_MODEL if custom_nlp is None else custom_nlp),
+        get_gazetteer().fingerprint(),
+    ]
+    if skills_file:
+        parts.append(f'{os.path.abspath(skills_file)}:'
+                     f'{os.path.getmtime(skills_file)}')
+    # options left at their default (None or False) are not part of the
+    # key, so `lookup(resume)` matches `ResumeParser(resume, cache=...)`
+    parts += [f'{key}={options[key]!r}' for key in sorted(options)
+              if options[key] is not None and options[key] is not False]
+    return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+class ResultCache(object):
+    '''
+    On-disk cache of extracted data and text, with least recently used
+    eviction once `max_entries` or `max_bytes` is exceeded. Safe to use
+    from several processes; instances can be pickled to pool workers.
+    '''
+
+    def __init__(self, path=DEFAULT_PATH, max_entries=100000,
+                 max_bytes=512 * 1024 * 1024):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.__local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self.__connection() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                'key TEXT PRIMARY KEY, kind TEXT, value TEXT, '
+                'size INTEGER, accessed REAL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS entries_accessed '
+                         'ON entries (accessed)')
+
+    def __getstate__(self):
+        return {'path': self.path, 'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__local = threading.local()
+
+    def __connection(self):
+        conn = getattr(self.__local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self.__local.conn = conn
+        return conn
+
+    def __get(self, kind, key):
+        conn = self.__connection()
+        row = conn.execute('SELECT value FROM entries WHERE key = ?',
+                           (f'{kind}:{key}',)).fetchone()
+        if row is None:
+            return None
+        with conn:
+            conn.execute('UPDATE entries SET accessed = ? WHERE key = ?',
+                         (time.time(), f'{kind}:{key}'))
+        return json.loads(row[0])
+
+    def __put(self, kind, key, value):
+        value = json.dumps(value, default=str)
+        with self.__connection() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)',
+                (f'{kind}:{key}', kind, value, len(value), time.time()))
+        self.evict()
+
+    def key(self, resume, **options):
+        '''
+        Cache key of a resume parsed with some options.
+
+        :param resume: file path or `io.BytesIO`
+        :param options: `ResumeParser` options, see `options_key`
+        :return: tuple of (content hash, options hash)
+        '''
+        return content_hash(resume), options_key(**options)
+
+    def get(self, key):
+        '''
+        Get cached extracted data. Spans are stored as strings.
+
+        :param key: key from `key`
+        :return: dictionary or None
+        '''
+        return self.__get(DATA, ':'.join(key))
+
+    def put(self, key, data, document=None):
+        '''
+        Store extracted data, and the extracted document if given.
+        '''
+        self.__put(DATA, ':'.join(key), data)
+        if document is not None:
+            self.put_document(key, document)
+
+    def get_document(self, key):
+        '''
+        Get the cached text, number of pages and metadata of a resume
+        (they only depend on its content).
+
+        :return: `utils.Document` or None
+        '''
+        document = self.__get(TEXT, f'v{CACHE_VERSION}:{key[0]}')
+        if document is None:
+            return None
+        return Document(**document)
+
+    def put_document(self, key, document):
+        '''
+        Store the text, number of pages and metadata of a resume.
+
+        :param document: `utils.Document`
+        '''
+        self.__put(TEXT, f'v{CACHE_VERSION}:{key[0]}', document._asdict())
+
+    def lookup(self, resume, **options):
+        '''
+        Shortcut for `get(key(resume, **options))`.
+        '''
+        return self.get(self.key(resume, **options))
+
+    def evict(self):
+        '''
+        Drop least recently used entries beyond the limits.
+        '''
+        conn = self.__connection()
+        count, size = conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        if count <= self.max_entries and size <= self.max_bytes:
+            return
+        drop = []
+        for key, entry_size in conn.execute(
+                'SELECT key, size FROM entries ORDER BY accessed'):
+            if count <= self.max_entries and size <= self.max_bytes:
+                break
+            drop.append((key,))
+            count -= 1
+            size -= entry_size
+        with conn:
+            conn.executemany('DELETE FROM entries WHERE key = ?', drop)
+
+    def clear(self):
+        '''
+        Remove every entry.
+        '''
+        with self.__connection() as conn:
+            conn.execute('DELETE FROM entries')
+
+    def __len__(self):
+        return self.__connection().execute(
+            'SELECT COUNT(*) FROM entries').fetchone()[0]
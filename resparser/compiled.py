@@ -0,0 +1,333 @@
+'''
+Compiled gazetteers: the csv files turned into one binary file of
+sorted string tables with a hash index, read through `mmap`. Workers
+then share the tables through the page cache instead of each parsing
+the csv files with pandas. The csv files stay the source of truth: the
+binary file records their checksums and is ignored once they change.
+
+    python -m resparser.compiled          # build resparser/gazetteer.bin
+
+Layout (native byte order): `MAGIC`, header length (uint32), JSON header,
+then one section per table, each 8-byte aligned from the end of the
+header:
+
+    offsets  (count + 1) x uint32   start of each string in the blob
+    order    count x uint32         sorted index of each entry, in file order
+    values   count x width x int32  optional values of each sorted entry
+    buckets  size x uint32          hash index: sorted index + 1, 0 if empty
+    blob     utf-8 strings, sorted
+'''
+import argparse
+import json
+import mmap
+import os
+import struct
+import zlib
+from array import array
+from bisect import bisect_left
+
+MAGIC = b'RPGAZ\x00\x00\x01'
+FILE_NAME = 'gazetteer.bin'
+# bumped when the tables change, older files are then ignored
+FORMAT_VERSION = 2
+
+# tables of a compiled gazetteer
+SKILLS = 'skills'                  # as written in skills.csv
+TITLES = 'titles'                  # normalized job titles
+MAJORS = 'majors'                  # in file order
+RANKED_UNIVERSITIES = 'ranked'     # in rank order, (rank, country) values
+UNIVERSITIES = 'universities'      # in file order, country values
+# countries are stored as their position in the 'countries' header list
+
+
+def checksum(file_path):
+    '''
+    Helper function to get the size and crc32 of a file.
+    '''
+    crc = 0
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            crc = zlib.crc32(chunk, crc)
+    return f'{os.path.getsize(file_path)}:{crc:08x}'
+
+
+def source_checksums(data_dir):
+    '''
+    Checksums of the csv files a gazetteer is compiled from.
+    '''
+    # imported here, gazetteer.py imports this module
+    from .gazetteer import SOURCE_FILES
+    return {file_name: checksum(os.path.join(data_dir, file_name))
+            for file_name in SOURCE_FILES}
+
+
+def _hash(data, mask):
+    return zlib.crc32(data) & mask
+
+
+def _align(buffer):
+    buffer.extend(b'\x00' * (-len(buffer) % 8))
+
+
+def _write_table(buffer, strings, values=None):
+    '''
+    Append one table to a bytearray.
+
+    :param strings: list of strings in file order, unique
+    :param values: list of ints or of tuples of ints of the same length,
+                   one per string, or None
+    :return: header entry of the table
+    '''
+    encoded = [string.encode('utf-8') for string in strings]
+    ranked = sorted(range(len(encoded)), key=encoded.__getitem__)
+    sorted_index = [0] * len(encoded)
+    for position, index in enumerate(ranked):
+        sorted_index[index] = position
+
+    size = 1
+    while size < 2 * len(encoded):
+        size *= 2
+    buckets = array('I', [0] * size)
+    for position, index in enumerate(ranked):
+        slot = _hash(encoded[index], size - 1)
+        while buckets[slot]:
+            slot = (slot + 1) & (size - 1)
+        buckets[slot] = position + 1
+
+    offsets = array('I', [0])
+    blob = bytearray()
+    for index in ranked:
+        blob += encoded[index]
+        offsets.append(len(blob))
+
+    entry = {'count': len(encoded), 'size': size}
+    sections = [('offsets', offsets), ('order', array('I', sorted_index))]
+    if values is not None:
+        rows = [values[index] for index in ranked]
+        if rows and isinstance(rows[0], tuple):
+            entry['width'] = len(rows[0])
+            rows = [value for row in rows for value in row]
+        sections.append(('values', array('i', rows)))
+    sections += [('buckets', buckets), ('blob', blob)]
+    for name, data in sections:
+        _align(buffer)
+        entry[name] = len(buffer)
+        buffer += data.tobytes() if isinstance(data, array) else data
+    return entry
+
+
+class StringTable(object):
+    '''
+    Read-only table of unique strings over a buffer: hashed membership,
+    lookup by sorted position, iteration in file or sorted order and
+    binary search.
+    '''
+
+    def __init__(self, buffer, entry):
+        '''
+        :param buffer: buffer of the tables (after the header)
+        :param entry: header entry of the table
+        '''
+        view = memoryview(buffer)
+        count, size = entry['count'], entry['size']
+        self.__count = count
+        self.__mask = size - 1
+        self.__offsets = view[entry['offsets']:
+                              entry['offsets'] + 4 * (count + 1)].cast('I')
+        self.__order = view[entry['order']:
+                            entry['order'] + 4 * count].cast('I')
+        self.__values = None
+        self.__width = entry.get('width')
+        if 'values' in entry:
+            length = 4 * count * (self.__width or 1)
+            self.__values = view[entry['values']:
+                                 entry['values'] + length].cast('i')
+        self.__buckets = view[entry['buckets']:
+                              entry['buckets'] + 4 * size].cast('I')
+        self.__blob = view[entry['blob']:entry['blob'] + self.__offsets[-1]]
+
+    def __len__(self):
+        return self.__count
+
+    def __bytes_at(self, position):
+        return self.__blob[self.__offsets[position]:
+                           self.__offsets[position + 1]]
+
+    def __getitem__(self, position):
+        '''
+        String at a position of the sorted table.
+        '''
+        if not 0 <= position < self.__count:
+            raise IndexError(position)
+        return bytes(self.__bytes_at(position)).decode('utf-8')
+
+    def find(self, string):
+        '''
+        Sorted position of a string, -1 if missing.
+        '''
+        if not isinstance(string, str):
+            return -1
+        data = string.encode('utf-8')
+        slot = _hash(data, self.__mask)
+        while self.__buckets[slot]:
+            position = self.__buckets[slot] - 1
+            if self.__bytes_at(position) == data:
+                return position
+            slot = (slot + 1) & self.__mask
+        return -1
+
+    def __contains__(self, string):
+        return self.find(string) >= 0
+
+    def value(self, position):
+        '''
+        Value stored with the string at a sorted position, a tuple if the
+        table has several values per string.
+        '''
+        if self.__width is None:
+            return self.__values[position]
+        start = position * self.__width
+        return tuple(self.__values[start:start + self.__width])
+
+    def get(self, string, default=None):
+        '''
+        Value stored with a string, `default` if missing.
+        '''
+        position = self.find(string)
+        return default if position < 0 else self.value(position)
+
+    def __iter__(self):
+        '''
+        Strings in sorted order.
+        '''
+        return (self[position] for position in range(self.__count))
+
+    def in_file_order(self):
+        '''
+        Strings in the order of the csv file.
+        '''
+        return (self[position] for position in self.__order)
+
+    def items(self):
+        '''
+        (string, value) pairs in the order of the csv file.
+        '''
+        return ((self[position], self.value(position))
+                for position in self.__order)
+
+    def prefixed(self, prefix):
+        '''
+        Strings starting with a prefix, by binary search.
+        '''
+        start = bisect_left(self, prefix)
+        for position in range(start, self.__count):
+            string = self[position]
+            if not string.startswith(prefix):
+                break
+            yield string
+
+
+class CompiledGazetteer(object):
+    '''
+    Tables of a compiled gazetteer file, mapped in memory.
+    '''
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self.__mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.__mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'not a compiled gazetteer: {path}')
+        length, = struct.unpack_from('I', self.__mmap, len(MAGIC))
+        start = len(MAGIC) + 4
+        self.header = json.loads(
+            self.__mmap[start:start + length].decode('utf-8'))
+        self.path = path
+        # tables start after the header, 8-byte aligned
+        start += length
+        self.__data = memoryview(self.__mmap)[start + (-start % 8):]
+        self.__tables = {}
+
+    def is_current(self, data_dir):
+        '''
+        Check whether the csv files are the ones the file was built from,
+        by this version of the code.
+        '''
+        return (self.header.get('version') == FORMAT_VERSION
+                and self.header.get('sources') == source_checksums(data_dir))
+
+    def table(self, name):
+        '''
+        One `StringTable` by name.
+        '''
+        if name not in self.__tables:
+            self.__tables[name] = StringTable(self.__data,
+                                              self.header['tables'][name])
+        return self.__tables[name]
+
+
+def build(path=None, data_dir=None):
+    '''
+    Compile the csv files of a folder into a binary gazetteer file.
+
+    :param path: output file, `FILE_NAME` in `data_dir` if None
+    :param data_dir: folder of the csv files, the package folder if None
+    :return: path of the file
+    '''
+    from .gazetteer import DATA_DIR, Gazetteer
+    from .ngrams import normalize
+    data_dir = data_dir or DATA_DIR
+    path = path or os.path.join(data_dir, FILE_NAME)
+    # read the csv files, never an older compiled file
+    gazetteer = Gazetteer(data_dir, use_compiled=False)
+    ranked = gazetteer.ranked_university_rows
+    universities = {}
+    for name, country in gazetteer.university_rows:
+        universities.setdefault(name, country)
+    countries = {}
+    for _, _, country in ranked:
+        countries.setdefault(country, len(countries))
+    for country in universities.values():
+        countries.setdefault(country, len(countries))
+
+    buffer = bytearray()
+    tables = {
+        SKILLS: _write_table(buffer, list(gazetteer.skills)),
+        TITLES: _write_table(buffer, list(dict.fromkeys(
+            normalize(title) for title in gazetteer.titles))),
+        MAJORS: _write_table(buffer, list(dict.fromkeys(gazetteer.majors))),
+        RANKED_UNIVERSITIES: _write_table(
+            buffer, [name for name, _, _ in ranked],
+            [(rank, countries[country]) for _, rank, country in ranked]),
+        UNIVERSITIES: _write_table(
+            buffer, list(universities),
+            [countries[country] for country in universities.values()]),
+    }
+    header = json.dumps({'version': FORMAT_VERSION,
+                         'sources': source_checksums(data_dir),
+                         'countries': list(countries),
+                         'tables': tables}).encode('utf-8')
+    prefix = bytearray(MAGIC + struct.pack('I', len(header)) + header)
+    _align(prefix)
+
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as file:
+        file.write(prefix)
+        file.write(buffer)
+    os.replace(temp_path, path)
+    return path
+
+
+def main():
+    '''
+    Main function.
+    '''
+    args = argparse.ArgumentParser(
+        description='Compile the gazetteer csv files into a binary file.')
+    args.add_argument('--data-dir', help='folder of the csv files')
+    args.add_argument('--output', help='output file')
+    args = args.parse_args()
+    print(build(args.output, args.data_dir))
+
+
+if __name__ == '__main__':
+    main()
@@ -2,8 +2,7 @@
 Constant file.
 '''
 # from nltk.corpus import stopwords
-import spacy
-sp = spacy.load('en_core_web_sm')
+from spacy.lang.en.stop_words import STOP_WORDS
 
 # Omkar Pathak
 NAME_PATTERN = [{'POS': 'PROPN'}, {'POS': 'PROPN'}]
@@ -17,6 +16,20 @@ EDUCATION = [
     'SSC', 'HSC', 'CBSE', 'ICSE', 'X', 'XII'
 ]
 
+# Level of each degree in EDUCATION, higher is more advanced
+DEGREE_LEVELS = {
+    'school': 0, 'bachelor': 1, 'master': 2, 'doctor': 3,
+}
+EDUCATION_LEVEL = {
+    'SSC': 0, 'HSC': 0, 'CBSE': 0, 'ICSE': 0, 'X': 0, 'XII': 0,
+    'BE': 1, 'B.E.': 1, 'B.E': 1, 'BS': 1, 'B.S': 1, 'B.S.': 1,
+    'BACHELOR': 1, 'BTECH': 1,
+    'ME': 2, 'M.E': 2, 'MS': 2, 'M.S': 2, 'M.S.': 2, 'MTECH': 2,
+    'MASTER': 2,
+    'PHD': 3, 'PH.D': 3, 'PH.D.': 3, 'MD': 3, 'M.D.': 3, 'M.D': 3,
+    'DOCTOR': 3,
+}
+
 NOT_ALPHA_NUMERIC = r'[^a-zA-Z\d]'
 
 NUMBER = r'\d+'
@@ -29,8 +42,14 @@ MONTHS_LONG = r'''(january)|(february)|(march)|(april)|(may)|(june)|(july)|
 MONTH = r'(' + MONTHS_SHORT + r'|' + MONTHS_LONG + r')'
 YEAR = r'(((20|19)(\d{2})))'
 
+# Contact details, compiled once in utils
+EMAIL = r'([^@|\s]+@[^@]+\.[^@|\s]+)'
+MOBILE_NUMBER = r'.*?(\(?\d{3}\D{0,3}\d{3}\D{0,3}\d{4}).*?'
+# MOBILE_NUMBER = r'''(\d{3}[-\.\s]??\d{3}[-\.\s]??\d{4}|\(\d{3}\)
+#                  [-\.\s]*\d{3}[-\.\s]??\d{4}|\d{3}[-\.\s]??\d{4})'''
+
 # STOPWORDS = set(stopwords.words('english'))
-STOPWORDS = sp.Defaults.stop_words
+STOPWORDS = STOP_WORDS
 
 RESUME_SECTIONS_PROFESSIONAL = [
     'experience',
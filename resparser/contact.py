@@ -0,0 +1,149 @@
+'''
+Contact-only pipeline: email and mobile number of many resumes, for
+dedup or CRM sync. No spaCy model is loaded. PDF pages are read one by
+one and reading stops as soon as both fields are found.
+
+    python -m resparser.contact resume/ --processes 4 --output contacts.jsonl
+'''
+import argparse
+import json
+import os
+import sys
+from functools import partial
+from . import pdf
+from . import utils
+from .rank_by_edu import iter_resume_files
+from .workers import WorkerPool
+
+CONTACT_FIELDS = ('email', 'mobile_number')
+
+# end of the text before a page searched again with it, so that an email
+# or number split by a page break is still found
+OVERLAP_CHARS = 200
+
+
+def iter_texts(resume):
+    '''
+    Text of a resume piece by piece: page by page for .pdf files, all at
+    once for other formats.
+
+    :param resume: file path or `io.BytesIO` with a name
+    :return: iterator of strings
+    '''
+    extension = utils.get_extension(resume)
+    if extension == '.pdf':
+        return pdf.iter_pages(resume)
+    return iter([utils.extract_text(resume, extension)])
+
+
+def extract_contact(resume, custom_regex=None):
+    '''
+    Email and mobile number of one resume, as `ResumeParser` finds them.
+
+    :param resume: file path or `io.BytesIO` with a name
+    :param custom_regex: regular expression for mobile numbers
+    :return: dictionary with 'email' and 'mobile_number'
+    '''
+    contact = dict.fromkeys(CONTACT_FIELDS)
+    tail = ''
+    for page in iter_texts(resume):
+        # only the new page is searched, after the end of the previous
+        # ones: the rest was searched already
+        text = ' '.join((tail + ' ' + page).split())
+        if contact['email'] is None:
+            contact['email'] = utils.extract_email(text)
+        if contact['mobile_number'] is None:
+            contact['mobile_number'] = utils.extract_mobile_number(
+                text, custom_regex)
+        if None not in contact.values():
+            break
+        tail = overlap(text)
+    return contact
+
+
+def overlap(text, size=OVERLAP_CHARS):
+    '''
+    Helper function to get the last words of a normalized text, at most
+    `size` characters, never starting in the middle of a word.
+    '''
+    if len(text) <= size:
+        return text
+    tail = text[-size:]
+    if text[-size - 1] != ' ':
+        tail = tail.partition(' ')[2]
+    return tail
+
+
+def _contact_row(custom_regex, resume):
+    '''
+    Worker function: contact of one file, or the error raised.
+    '''
+    row = {'path': resume}
+    try:
+        row.update(extract_contact(resume, custom_regex))
+    except Exception as error:  # pylint: disable=broad-except
+        row['error'] = f'{type(error).__name__}: {error}'
+    return row
+
+
+def extract_contacts(resumes, processes=1, custom_regex=None, chunksize=64):
+    '''
+    Contacts of many resumes. A file that cannot be read gets an 'error'
+    instead of stopping the batch.
+
+    :param resumes: iterable of file paths
+    :param processes: number of worker processes, cpu count if None;
+                      1 runs in this process
+    :param custom_regex: regular expression for mobile numbers
+    :param chunksize: files sent to a worker at once
+    :return: iterator of dictionaries with 'path', 'email' and
+             'mobile_number', in input order
+    '''
+    func = partial(_contact_row, custom_regex)
+    if processes == 1:
+        yield from map(func, resumes)
+        return
+    # workers do not need the spaCy models
+    with WorkerPool(processes, initializer=None) as pool:
+        yield from pool.imap(func, resumes, chunksize)
+
+
+def iter_paths(paths, recursive=True):
+    '''
+    Resume files from a list of files and folders.
+    '''
+    for path in paths:
+        if os.path.isdir(path):
+            for name in iter_resume_files(path, recursive):
+                yield os.path.join(path, name)
+        else:
+            yield path
+
+
+def main():
+    '''
+    Main function.
+    '''
+    args = argparse.ArgumentParser(
+        description='Extract the email and mobile number of resumes.')
+    args.add_argument('paths', nargs='+', help='resume files or folders')
+    args.add_argument('--processes', type=int, default=1)
+    args.add_argument('--output', help='.jsonl file, stdout if not given')
+    args.add_argument('--custom-regex', help='regex for mobile numbers')
+    args.add_argument('--no-recursive', action='store_true',
+                      help='do not walk sub folders')
+    args = args.parse_args()
+
+    output = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        for row in extract_contacts(
+                iter_paths(args.paths, not args.no_recursive),
+                args.processes, args.custom_regex):
+            output.write(json.dumps(row) + '\n')
+    finally:
+        if args.output:
+            output.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+'''
+Approximate lookup of strings within a bounded edit distance. A
+character trigram inverted index gives the few entries that can be close
+enough to a query, and only those are compared with an edit distance
+cut off at the bound, so a query never scans all the entries.
+'''
+from array import array
+from bisect import bisect_left, bisect_right
+
+# trigrams changed by one edit at most: a swap of two characters
+GRAMS_PER_EDIT = 4
+
+
+def trigrams(text):
+    '''
+    Helper function to get the set of character trigrams of a string,
+    padded with one space on each side.
+    '''
+    text = f' {text} '
+    return {text[start:start + 3] for start in range(len(text) - 2)}
+
+
+def edit_distance(first, second, max_distance):
+    '''
+    Edit distance of two strings, where swapping two adjacent characters
+    is one edit ('oxfrod'), computed only in the band of cells that can
+    stay within a bound.
+
+    :param max_distance: bound of the distance
+    :return: the distance, or `max_distance + 1` if it is larger
+    '''
+    over = max_distance + 1
+    if abs(len(first) - len(second)) > max_distance:
+        return over
+    width = len(second) + 1
+    before = None
+    previous = [column if column <= max_distance else over
+                for column in range(width)]
+    for row in range(1, len(first) + 1):
+        current = [over] * width
+        if row <= max_distance:
+            current[0] = row
+        char = first[row - 1]
+        for column in range(max(1, row - max_distance),
+                            min(width, row + max_distance + 1)):
+            other = second[column - 1]
+            cost = min(previous[column] + 1, current[column - 1] + 1,
+                       previous[column - 1] + (char != other))
+            if (before is not None and column > 1 and char != other
+                    and char == second[column - 2]
+                    and first[row - 2] == other):
+                cost = min(cost, before[column - 2] + 1)
+            current[column] = min(cost, over)
+        if min(current) > max_distance:
+            return over
+        before, previous = previous, current
+    return previous[-1]
+
+
+class TrigramIndex(object):
+    '''
+    Inverted index of strings by character trigram. The strings of each
+    trigram are sorted by length, so that only those of a length close
+    enough to the query are read.
+    '''
+
+    def __init__(self, strings):
+        '''
+        :param strings: iterable of strings, found by position
+        '''
+        self.strings = tuple(strings)
+        # trigram -> id, and the trigram ids of each string
+        self.__ids = {}
+        self.__grams = []
+        postings = {}
+        for position, string in enumerate(self.strings):
+            ids = array('I')
+            for gram in trigrams(string):
+                ids.append(self.__ids.setdefault(gram, len(self.__ids)))
+                postings.setdefault(gram, []).append(position)
+            self.__grams.append(ids)
+        # all positions by length, for queries too short to filter
+        by_length = sorted(range(len(self.strings)),
+                           key=lambda position: len(self.strings[position]))
+        self.__all = (array('I', [len(self.strings[position])
+                                  for position in by_length]),
+                      array('I', by_length))
+        # trigram -> (lengths, positions), by length
+        self.__postings = {}
+        for gram, positions in postings.items():
+            positions.sort(key=lambda position: len(self.strings[position]))
+            self.__postings[gram] = (
+                array('I', [len(self.strings[position])
+                            for position in positions]),
+                array('I', positions))
+
+    def __posting(self, gram, low, high):
+        '''
+        Positions of the strings with a trigram (any if None) and a length
+        in a range.
+        '''
+        if gram is None:
+            lengths, positions = self.__all
+        else:
+            try:
+                lengths, positions = self.__postings[gram]
+            except KeyError:
+                return ()
+        return positions[bisect_left(lengths, low):bisect_right(lengths, high)]
+
+    def __len__(self):
+        return len(self.strings)
+
+    def search(self, query, max_distance):
+        '''
+        Strings within an edit distance of a query.
+
+        :param query: string to look up
+        :param max_distance: largest edit distance accepted
+        :return: list of (distance, position), closest first
+        '''
+        low, high = len(query) - max_distance, len(query) + max_distance
+        postings = [self.__posting(gram, low, high)
+                    for gram in trigrams(query)]
+        postings.sort(key=len)
+        # a string within k edits of the query shares all but 4k of its
+        # trigrams, so at least one of any 4k + 1 of them: only the
+        # strings of the rarest ones, of a close length, are read
+        changed = GRAMS_PER_EDIT * max_distance
+        shared = len(postings) - changed
+        if shared <= 0:
+            # a string may share no trigram with a query this short, so
+            # every string of a close length is compared
+            postings = [self.__posting(None, low, high)]
+        candidates = set()
+        for positions in postings[:changed + 1]:
+            candidates.update(positions)
+        ids = {self.__ids.get(gram) for gram in trigrams(query)}
+        found = []
+        for position in candidates:
+            if len(ids.intersection(self.__grams[position])) < shared:
+                continue
+            distance = edit_distance(query, self.strings[position],
+                                     max_distance)
+            if distance <= max_distance:
+                found.append((distance, position))
+        return sorted(found)
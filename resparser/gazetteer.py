@@ -0,0 +1,330 @@
+'''
+Gazetteers (skills, job titles, majors, universities) loaded once per
+process and kept as hashed, case-normalized lookup tables. Tables are
+read from the compiled binary file when it is up to date with the csv
+files (see compiled.py), otherwise from the csv files.
+'''
+import os
+import threading
+import pandas as pd
+from . import compiled
+from .automaton import Automaton
+from .ngrams import NgramIndex
+from .universities import UniversityIndex
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SKILLS_FILE = 'skills.csv'
+TITLES_FILE = 'jobtitles.csv'
+MAJORS_FILE = 'majorslist.csv'
+RANKS_FILE = 'World_University_Rank_2020.csv'
+UNIVERSITIES_FILE = 'world-universities.csv'
+SOURCE_FILES = (SKILLS_FILE, TITLES_FILE, MAJORS_FILE, RANKS_FILE,
+                UNIVERSITIES_FILE)
+
+# number of custom skills files kept in memory
+SKILLS_CACHE_SIZE = 16
+
+_LOCK = threading.RLock()
+_GAZETTEER = None
+_SKILLS_CACHE = {}
+
+
+def read_skills(skills_file):
+    '''
+    Helper function to read a skills csv. Skills are the column names.
+
+    :param skills_file: path of the csv file
+    :return: list of skills
+    '''
+    return list(pd.read_csv(skills_file).columns.values)
+
+
+class Gazetteer(object):
+    '''
+    Lookup tables built from the csv files in `data_dir`. Every table is
+    read on first access only.
+    '''
+
+    def __init__(self, data_dir=DATA_DIR, use_compiled=True):
+        '''
+        :param data_dir: folder of the csv files
+        :param use_compiled: read the compiled file of `data_dir` when it
+                             is up to date
+        '''
+        self.data_dir = data_dir
+        self.use_compiled = use_compiled
+        self.__tables = {}
+
+    def path(self, file_name):
+        '''
+        Full path of a gazetteer file.
+        '''
+        return os.path.join(self.data_dir, file_name)
+
+    def __table(self, key, loader):
+        try:
+            return self.__tables[key]
+        except KeyError:
+            pass
+        with _LOCK:
+            if key not in self.__tables:
+                self.__tables[key] = loader()
+            return self.__tables[key]
+
+    def __load_compiled(self):
+        path = self.path(compiled.FILE_NAME)
+        if not self.use_compiled or not os.path.exists(path):
+            return None
+        compiled_file = compiled.CompiledGazetteer(path)
+        if not compiled_file.is_current(self.data_dir):
+            return None
+        return compiled_file
+
+    @property
+    def compiled_file(self):
+        '''
+        `compiled.CompiledGazetteer` the tables are read from, None if the
+        compiled file is missing or older than the csv files.
+        '''
+        return self.__table('compiled_file', self.__load_compiled)
+
+    def __compiled_table(self, name):
+        if self.compiled_file is None:
+            return None
+        return self.compiled_file.table(name)
+
+    def __load_skills(self):
+        table = self.__compiled_table(compiled.SKILLS)
+        if table is not None:
+            return frozenset(table)
+        return frozenset(read_skills(self.path(SKILLS_FILE)))
+
+    @property
+    def skills(self):
+        '''
+        Set of skills, as written in skills.csv.
+        '''
+        return self.__table('skills', self.__load_skills)
+
+    @property
+    def skills_upper(self):
+        '''
+        Set of upper-cased skills.
+        '''
+        return self.__table('skills_upper', lambda: frozenset(
+            skill.upper() for skill in self.skills))
+
+    @property
+    def skill_index(self):
+        '''
+        N-gram index of the skills.
+        '''
+        return self.__table('skill_index', lambda: NgramIndex(self.skills))
+
+    def __load_title_index(self):
+        table = self.__compiled_table(compiled.TITLES)
+        if table is not None:
+            # looked up in the mapped file, shared by all processes
+            return NgramIndex.from_normalized(table)
+        return NgramIndex(pd.read_csv(self.path(TITLES_FILE)).Title.values)
+
+    @property
+    def title_index(self):
+        '''
+        N-gram index of the job titles.
+        '''
+        return self.__table('title_index', self.__load_title_index)
+
+    @property
+    def titles(self):
+        '''
+        Set of normalized (lower-cased) job titles.
+        '''
+        return self.title_index.phrases
+
+    def __load_majors(self):
+        table = self.__compiled_table(compiled.MAJORS)
+        if table is not None:
+            return tuple(table.in_file_order())
+        return tuple(pd.read_csv(self.path(MAJORS_FILE)).Major)
+
+    @property
+    def majors(self):
+        '''
+        List of majors as written in the file, in file order. The file
+        spells them upper-cased, except for its 'N/A' row.
+        '''
+        return self.__table('majors', self.__load_majors)
+
+    def __load_ranked(self):
+        table = self.__compiled_table(compiled.RANKED_UNIVERSITIES)
+        if table is not None:
+            countries = self.compiled_file.header['countries']
+            return tuple((name, rank, countries[country])
+                         for name, (rank, country) in table.items())
+        data = pd.read_csv(self.path(RANKS_FILE))
+        rows = {}
+        for name, rank, country in zip(data.University, data.Score_Rank,
+                                       data.Country):
+            rows.setdefault(name, (name, int(rank), country))
+        return tuple(rows.values())
+
+    @property
+    def ranked_university_rows(self):
+        '''
+        List of (name, rank, country) of ranked universities, in rank
+        order.
+        '''
+        return self.__table('ranked_university_rows', self.__load_ranked)
+
+    @property
+    def university_ranks(self):
+        '''
+        Dictionary of ranked university name to its rank, in rank order.
+        '''
+        return self.__table('university_ranks', lambda: {
+            name: rank for name, rank, _ in self.ranked_university_rows})
+
+    @property
+    def ranked_universities(self):
+        '''
+        List of ranked university names, in rank order.
+        '''
+        return self.__table('ranked_universities', lambda: tuple(
+            self.university_ranks))
+
+    def __load_universities(self):
+        table = self.__compiled_table(compiled.UNIVERSITIES)
+        if table is not None:
+            countries = self.compiled_file.header['countries']
+            return tuple((name, countries[country])
+                         for name, country in table.items())
+        data = pd.read_csv(self.path(UNIVERSITIES_FILE))
+        return tuple(zip(data.name, data.country))
+
+    @property
+    def university_rows(self):
+        '''
+        List of (name, country) of all universities, in file order.
+        '''
+        return self.__table('university_rows', self.__load_universities)
+
+    @property
+    def universities(self):
+        '''
+        List of all university names, in file order.
+        '''
+        return self.__table('universities', lambda: tuple(
+            name for name, _ in self.university_rows))
+
+    @property
+    def university_index(self):
+        '''
+        `universities.UniversityIndex` of ranked and other universities,
+        with their aliases.
+        '''
+        return self.__table('university_index', lambda: UniversityIndex(
+            self.ranked_university_rows, self.university_rows,
+            blocked_acronyms=self.skills_upper))
+
+    @property
+    def universities_upper(self):
+        '''
+        Set of upper-cased university names.
+        '''
+        return self.__table('universities_upper', lambda: frozenset(
+            college.upper() for college in self.universities))
+
+    @property
+    def non_company_upper(self):
+        '''
+        Set of upper-cased names that are never company names
+        (universities and skills).
+        '''
+        return self.__table('non_company_upper', lambda:
+                            self.universities_upper | self.skills_upper)
+
+    @property
+    def major_matcher(self):
+        '''
+        Automaton over the majors, for upper-cased text.
+        '''
+        return self.__table('major_matcher', lambda: Automaton(self.majors))
+
+    def fingerprint(self):
+        '''
+        Name, size and modification time of every gazetteer file, so that
+        cached results can be invalidated when a csv changes.
+        '''
+        parts = []
+        for file_name in SOURCE_FILES:
+            stat = os.stat(self.path(file_name))
+            parts.append(f'{file_name}:{stat.st_size}:{stat.st_mtime}')
+        return ';'.join(parts)
+
+    def get_skill_index(self, skills_file=None):
+        '''
+        N-gram index of the skills of a custom skills file, or of the
+        bundled one. Custom files are cached by path and modification
+        time.
+
+        :param skills_file: path of a skills csv
+        :return: `ngrams.NgramIndex`
+        '''
+        if not skills_file:
+            return self.skill_index
+        return load_skill_index(skills_file)
+
+    def load_all(self):
+        '''
+        Load every table, e.g. when warming up a worker process.
+        '''
+        for attr in ('skills_upper', 'skill_index', 'title_index',
+                     'major_matcher', 'university_index',
+                     'non_company_upper'):
+            getattr(self, attr)
+        self.university_index.load_names()
+        return self
+
+
+def load_skill_index(skills_file):
+    '''
+    Read a custom skills file, cached by path and modification time.
+
+    :param skills_file: path of a skills csv
+    :return: `ngrams.NgramIndex`
+    '''
+    path = os.path.abspath(skills_file)
+    key = (path, os.path.getmtime(path))
+    try:
+        return _SKILLS_CACHE[key]
+    except KeyError:
+        pass
+    skills = NgramIndex(read_skills(path))
+    with _LOCK:
+        for old_key in [k for k in _SKILLS_CACHE if k[0] == path]:
+            del _SKILLS_CACHE[old_key]
+        while len(_SKILLS_CACHE) >= SKILLS_CACHE_SIZE:
+            del _SKILLS_CACHE[next(iter(_SKILLS_CACHE))]
+        _SKILLS_CACHE[key] = skills
+    return skills
+
+
+def get_gazetteer():
+    '''
+    Get the process-wide gazetteer for the bundled csv files.
+    '''
+    global _GAZETTEER
+    if _GAZETTEER is None:
+        with _LOCK:
+            if _GAZETTEER is None:
+                _GAZETTEER = Gazetteer()
+    return _GAZETTEER
+
+
+def warm_up():
+    '''
+    Load every bundled gazetteer table.
+    '''
+    return get_gazetteer().load_all()
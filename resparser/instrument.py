@@ -0,0 +1,224 @@
+'''
+Per-stage timings of the parser. Every `ResumeParser` records how long
+each stage took (text extraction, sections, each nlp call, the custom
+NER and each extract_* function), optionally with the memory allocated,
+and sends them to the registered metrics sinks.
+
+Stages are exclusive: the time of a stage run inside another one, such
+as the nlp call of the whole text made by the single-pass sections, only
+counts for the inner stage. Only TOTAL covers all the others.
+'''
+import logging
+import math
+import random
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from time import perf_counter
+
+# stage names
+EXTRACT_TEXT = 'extract_text'
+SECTIONS = 'sections'
+CUSTOM_NER = 'custom_ner'
+CACHE = 'cache'
+TOTAL = 'total'
+
+# samples kept per stage by `TimingStats` for percentiles
+RESERVOIR_SIZE = 10000
+
+_SINKS = []
+_LOCK = threading.Lock()
+# per thread: whether sinks are muted, see `muted`
+_LOCAL = threading.local()
+
+logger = logging.getLogger(__name__)
+
+
+def nlp_stage(stage):
+    '''
+    Name of the stage of an nlp call, e.g. 'nlp:education'.
+    '''
+    return 'nlp:' + stage
+
+
+def add_sink(sink):
+    '''
+    Register a metrics sink, called after every parsed resume with
+    `sink(resume, timings, allocations)`: the resume (path or stream),
+    seconds per stage and bytes per stage (None unless tracked).
+
+    Sinks are called in the process that asked for the parsing:
+    `ResumeRank` and `aio` workers send their timings back, and the
+    parent process calls the sinks. Errors of a sink are logged.
+    '''
+    with _LOCK:
+        _SINKS.append(sink)
+
+
+def remove_sink(sink):
+    '''
+    Unregister a metrics sink.
+    '''
+    with _LOCK:
+        _SINKS.remove(sink)
+
+
+def emit(resume, timings, allocations=None):
+    '''
+    Send the timings of one resume to every sink, unless muted.
+    '''
+    if getattr(_LOCAL, 'muted', False):
+        return
+    with _LOCK:
+        sinks = list(_SINKS)
+    for sink in sinks:
+        try:
+            sink(resume, timings, allocations)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception('metrics sink %r failed', sink)
+
+
+@contextmanager
+def muted():
+    '''
+    Context manager: do not send timings to the sinks in this thread.
+    Used by worker functions returning their timings to the parent
+    process, which sends them.
+    '''
+    previous = getattr(_LOCAL, 'muted', False)
+    _LOCAL.muted = True
+    try:
+        yield
+    finally:
+        _LOCAL.muted = previous
+
+
+class Timings(object):
+    '''
+    Seconds (and optionally bytes allocated) per stage of one resume.
+    A stage run several times adds up. Nested stages are not counted in
+    the stages around them.
+    '''
+
+    def __init__(self, allocations=False):
+        '''
+        :param allocations: also track memory allocated per stage with
+                            `tracemalloc`, which slows parsing down
+        '''
+        self.timings = {}
+        self.allocations = {} if allocations else None
+        if allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.__start = perf_counter()
+        # seconds and bytes of the stages nested in each open stage
+        self.__nested = []
+
+    @contextmanager
+    def stage(self, name):
+        '''
+        Context manager timing one stage.
+        '''
+        if self.allocations is not None:
+            memory = tracemalloc.get_traced_memory()[0]
+        start_time = perf_counter()
+        self.__nested.append([0, 0])
+        try:
+            yield
+        finally:
+            nested_seconds, nested_bytes = self.__nested.pop()
+            seconds = perf_counter() - start_time
+            self.timings[name] = (self.timings.get(name, 0)
+                                  + seconds - nested_seconds)
+            if self.__nested:
+                self.__nested[-1][0] += seconds
+            if self.allocations is not None:
+                allocated = tracemalloc.get_traced_memory()[0] - memory
+                self.allocations[name] = (self.allocations.get(name, 0)
+                                          + allocated - nested_bytes)
+                if self.__nested:
+                    self.__nested[-1][1] += allocated
+
+    def call(self, name, func, *args, **kwargs):
+        '''
+        Call a function as one stage.
+        '''
+        with self.stage(name):
+            return func(*args, **kwargs)
+
+    def finish(self):
+        '''
+        Record the total time since creation.
+
+        :return: dictionary of seconds per stage
+        '''
+        self.timings[TOTAL] = perf_counter() - self.__start
+        return self.timings
+
+
+def percentile(values, pct):
+    '''
+    Nearest-rank percentile of a list of numbers, None if empty.
+    '''
+    if not values:
+        return None
+    values = sorted(values)
+    return values[max(0, math.ceil(len(values) * pct / 100) - 1)]
+
+
+class TimingStats(object):
+    '''
+    Count, mean and percentiles of the timings of many resumes, added one
+    by one. Memory is bounded: percentiles come from a uniform sample of
+    at most `reservoir` values per stage, exact up to that many resumes.
+    '''
+
+    def __init__(self, reservoir=RESERVOIR_SIZE, seed=None):
+        self.reservoir = reservoir
+        self.counts = {}
+        self.sums = {}
+        self.samples = {}
+        self.__random = random.Random(seed)
+
+    def add(self, timings):
+        '''
+        Add the seconds per stage of one resume.
+        '''
+        for stage, seconds in timings.items():
+            count = self.counts.get(stage, 0) + 1
+            self.counts[stage] = count
+            self.sums[stage] = self.sums.get(stage, 0) + seconds
+            samples = self.samples.setdefault(stage, [])
+            if len(samples) < self.reservoir:
+                samples.append(seconds)
+            else:
+                # reservoir sampling: keep each value with equal chance
+                index = self.__random.randrange(count)
+                if index < self.reservoir:
+                    samples[index] = seconds
+
+    def summary(self):
+        '''
+        :return: dictionary of stage to {'count', 'mean', 'p50', 'p95'}
+        '''
+        return {
+            stage: {
+                'count': count,
+                'mean': self.sums[stage] / count,
+                'p50': percentile(self.samples[stage], 50),
+                'p95': percentile(self.samples[stage], 95),
+            }
+            for stage, count in self.counts.items()
+        }
+
+
+def summarize(timings):
+    '''
+    Aggregate the timings of many resumes.
+
+    :param timings: iterable of dictionaries of seconds per stage
+    :return: dictionary of stage to {'count', 'mean', 'p50', 'p95'}
+    '''
+    stats = TimingStats()
+    for record in timings:
+        stats.add(record)
+    return stats.summary()
@@ -0,0 +1,149 @@
+'''
+Process-wide registry of spaCy pipelines.
+
+Loading a spaCy model takes seconds, so every pipeline used by the parser
+is loaded once per process and shared by all `ResumeParser` instances.
+'''
+import json
+import os
+import threading
+import spacy
+from spacy.util import get_package_path, is_package
+
+# pipeline used for tagging, parsing and named entities
+DEFAULT_MODEL = 'default'
+# custom trained NER model bundled with the package
+CUSTOM_MODEL = 'custom'
+
+MODEL_SOURCES = {
+    DEFAULT_MODEL: 'en_core_web_sm',
+    CUSTOM_MODEL: os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                               'model'),
+}
+
+_MODELS = {}
+_LOCK = threading.RLock()
+
+
+def get_model(name=DEFAULT_MODEL):
+    '''
+    Get a loaded pipeline, loading it on first use.
+
+    :param name: registry name (`DEFAULT_MODEL`, `CUSTOM_MODEL`) or any
+                 name/path accepted by `spacy.load`
+    :return: object of `spacy.language.Language`
+    '''
+    try:
+        return _MODELS[name]
+    except KeyError:
+        pass
+    with _LOCK:
+        if name not in _MODELS:
+            _MODELS[name] = spacy.load(MODEL_SOURCES.get(name, name))
+        return _MODELS[name]
+
+
+def get_nlp():
+    '''
+    Shortcut for the default spaCy pipeline.
+    '''
+    return get_model(DEFAULT_MODEL)
+
+
+def get_custom_nlp():
+    '''
+    Shortcut for the custom trained NER pipeline.
+    '''
+    return get_model(CUSTOM_MODEL)
+
+
+def register(name, nlp):
+    '''
+    Register a preloaded or custom pipeline under a name. Registering
+    `DEFAULT_MODEL` or `CUSTOM_MODEL` replaces the pipeline used by
+    every parser created afterwards.
+
+    :param name: registry name
+    :param nlp: object of `spacy.language.Language`
+    '''
+    with _LOCK:
+        _MODELS[name] = nlp
+
+
+def set_source(name, source):
+    '''
+    Change where a registry name is loaded from. Takes effect on the
+    next load or reload.
+
+    :param name: registry name
+    :param source: model package name or path for `spacy.load`
+    '''
+    with _LOCK:
+        MODEL_SOURCES[name] = source
+
+
+def is_loaded(name=DEFAULT_MODEL):
+    '''
+    Check whether a pipeline is already in memory.
+    '''
+    return name in _MODELS
+
+
+def model_version(model=DEFAULT_MODEL):
+    '''
+    Describe a pipeline as '<lang>_<name>-<version>'. Pipelines that are
+    not loaded yet are described from their meta.json without loading.
+    Components added at run time are not part of it, so a pipeline is
+    described the same in every process.
+
+    :param model: registry name or object of `spacy.language.Language`
+    :return: string
+    '''
+    if isinstance(model, str):
+        if model in _MODELS:
+            meta = _MODELS[model].meta
+        else:
+            source = MODEL_SOURCES.get(model, model)
+            if is_package(source):
+                source = get_package_path(source)
+            try:
+                with open(os.path.join(str(source), 'meta.json')) as file:
+                    meta = json.load(file)
+            except (IOError, ValueError):
+                return str(source)
+    else:
+        meta = model.meta
+    return f"{meta.get('lang')}_{meta.get('name')}-{meta.get('version')}"
+
+
+def warm_up(names=(DEFAULT_MODEL, CUSTOM_MODEL)):
+    '''
+    Load pipelines ahead of time, e.g. as a `multiprocessing.Pool`
+    initializer so that each worker loads its models exactly once.
+
+    :param names: iterable of registry names
+    '''
+    for name in names:
+        get_model(name)
+
+
+def reload(name=None):
+    '''
+    Drop cached pipelines and load them again from their source.
+
+    :param name: registry name, reload every loaded pipeline if None
+    '''
+    with _LOCK:
+        names = list(_MODELS) if name is None else [name]
+        for key in names:
+            _MODELS.pop(key, None)
+        for key in names:
+            get_model(key)
+
+
+def clear():
+    '''
+    Forget all loaded pipelines.
+    '''
+    with _LOCK:
+        _MODELS.clear()
@@ -0,0 +1,85 @@
+'''
+Index of normalized phrases (skills, job titles) matched against every
+1 to `MAX_NGRAM` word window of a Doc. Each window is one hash lookup,
+so the cost depends on the length of the text, not on the number of
+phrases.
+'''
+# longest phrase, in words, looked up for every window of a text
+MAX_NGRAM = 4
+# longest window in spaCy tokens, e.g. 'django-rest-framework' is one
+# word but five tokens
+MAX_NGRAM_TOKENS = 12
+
+
+def normalize(phrase):
+    '''
+    Helper function to normalize a phrase: lower case, single spaces.
+    '''
+    return ' '.join(phrase.lower().split())
+
+
+class NgramIndex(object):
+    '''
+    Set of normalized phrases with a lookup of all the n-grams of a Doc.
+    '''
+
+    def __init__(self, phrases, max_ngram=MAX_NGRAM):
+        '''
+        :param phrases: iterable of strings, other values are skipped
+        :param max_ngram: longest window in words
+        '''
+        self.phrases = frozenset(
+            normalize(phrase) for phrase in phrases
+            if isinstance(phrase, str) and phrase.strip())
+        self.max_ngram = max_ngram
+
+    @classmethod
+    def from_normalized(cls, phrases, max_ngram=MAX_NGRAM):
+        '''
+        Index over a container of phrases already normalized, used as
+        is, e.g. a table of a compiled gazetteer.
+
+        :param phrases: container supporting `in`, `len` and iteration
+        :param max_ngram: longest window in words
+        '''
+        index = cls((), max_ngram)
+        index.phrases = phrases
+        return index
+
+    def __contains__(self, phrase):
+        return normalize(phrase) in self.phrases
+
+    def __len__(self):
+        return len(self.phrases)
+
+    def find(self, tokens):
+        '''
+        Find phrases in a sequence of tokens, in windows of at most
+        `max_ngram` words with spaces as in the text. Single stop words
+        are skipped, like the one-gram check they replace.
+
+        :param tokens: `spacy.tokens.doc.Doc`, Span or list of tokens
+        :return: list of (start, end, normalized phrase), by start
+        '''
+        tokens = list(tokens)
+        matches = []
+        for start, first in enumerate(tokens):
+            if first.is_space:
+                continue
+            text = ''
+            words = 1
+            for end in range(start, min(start + MAX_NGRAM_TOKENS,
+                                        len(tokens))):
+                if end > start and tokens[end - 1].whitespace_:
+                    words += 1
+                    if words > self.max_ngram:
+                        break
+                text += tokens[end].text
+                if end == start and first.is_stop:
+                    text += first.whitespace_
+                    continue
+                phrase = normalize(text)
+                if phrase in self.phrases:
+                    matches.append((start, end + 1, phrase))
+                text += tokens[end].whitespace_
+        return matches
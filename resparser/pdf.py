@@ -0,0 +1,352 @@
+'''
+PDF text extraction engine. One resource manager, converter and
+interpreter are shared by all pages of a document, so pdfminer's font
+and resource caches are kept from page to page.
+'''
+import atexit
+import io
+import mmap
+import os
+import multiprocessing as mp
+from collections import namedtuple
+from contextlib import contextmanager
+from itertools import islice
+from pdfminer.converter import TextConverter
+from pdfminer.layout import LAParams
+from pdfminer.pdfdocument import PDFDocument, PDFTextExtractionNotAllowed
+from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdfparser import PDFParser, PDFSyntaxError
+from pdfminer.pdftypes import resolve1
+from pdfminer.psparser import PSLiteral
+from pdfminer.utils import decode_text
+
+# text of each page, number of pages and document information of a pdf
+PdfContent = namedtuple('PdfContent', ['pages', 'no_of_pages', 'metadata'])
+
+# documents with more pages are split across processes
+PARALLEL_PAGE_THRESHOLD = 20
+
+# engines of `read_pdf` by (parallel_threshold, processes)
+_ENGINES = {}
+
+
+@contextmanager
+def open_source(source, use_mmap=True):
+    '''
+    Helper function to get a readable binary file object for any kind
+    of pdf source.
+
+    :param source: file path, bytes, `io.BytesIO`, `mmap.mmap` or any
+                   seekable binary file object (read from its start)
+    :param use_mmap: map files given by path instead of reading them
+    '''
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as pdffile:
+            if not use_mmap or os.fstat(pdffile.fileno()).st_size == 0:
+                yield pdffile
+                return
+            with mmap.mmap(pdffile.fileno(), 0,
+                           access=mmap.ACCESS_READ) as mapped:
+                yield mapped
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        yield io.BytesIO(source)
+    else:
+        source.seek(0)
+        yield source
+
+
+def shareable_source(source):
+    '''
+    Helper function to turn a pdf source into something that can be sent
+    to another process: a file path or bytes.
+    '''
+    if isinstance(source, (str, os.PathLike, bytes)):
+        return source
+    if isinstance(source, (bytearray, memoryview)):
+        return bytes(source)
+    if isinstance(source, io.BytesIO):
+        return source.getvalue()
+    if isinstance(source, mmap.mmap):
+        return source[:]
+    source.seek(0)
+    return source.read()
+
+
+def _extract_page_range(args):
+    '''
+    Worker function for page-parallel extraction.
+
+    :param args: tuple of (source, first page, end page, engine options)
+    :return: tuple of (list of page texts, False if the pdf is broken)
+    '''
+    source, start, end, options = args
+    engine = PDFTextEngine(parallel_threshold=None, **options)
+    texts = []
+    with open_source(source, engine.use_mmap) as pdffile:
+        try:
+            document = engine.open_document(pdffile)
+            pages = islice(PDFPage.create_pages(document), start, end)
+            for text in engine.iter_page_texts(document, pages):
+                texts.append(text)
+        except PDFSyntaxError:
+            return texts, False
+    return texts, True
+
+
+def in_child_process():
+    '''
+    Helper function to check whether this is a process started by
+    `multiprocessing` (pool worker or not), where no pool is started.
+    '''
+    parent_process = getattr(mp, 'parent_process', None)  # python 3.8+
+    if parent_process is not None:
+        return parent_process() is not None
+    return mp.current_process().name != 'MainProcess'
+
+
+def page_count(document):
+    '''
+    Helper function to get the number of pages of a pdf from its page
+    tree, without creating or interpreting the pages.
+
+    :param document: object of `pdfminer.pdfdocument.PDFDocument`
+    :return: int
+    '''
+    try:
+        count = resolve1(resolve1(document.catalog['Pages'])['Count'])
+        if isinstance(count, int) and count >= 0:
+            return count
+    except (KeyError, TypeError):
+        pass
+    # broken page tree root, walk the tree
+    return sum(1 for _ in PDFPage.create_pages(document))
+
+
+def pdf_metadata(document):
+    '''
+    Helper function to get the document information (title, author,
+    dates...) of a pdf as strings.
+
+    :param document: object of `pdfminer.pdfdocument.PDFDocument`
+    :return: dictionary
+    '''
+    metadata = {}
+    for info in document.info:
+        for key, value in info.items():
+            value = resolve1(value)
+            if isinstance(value, bytes):
+                value = decode_text(value)
+            elif isinstance(value, PSLiteral):
+                value = value.name
+            if isinstance(value, (str, int, float)):
+                metadata[key] = value
+    return metadata
+
+
+class PDFTextEngine(object):
+    '''
+    Extract the text of pdf files page by page.
+    '''
+
+    def __init__(self, laparams=None, use_mmap=True, caching=True,
+                 parallel_threshold=PARALLEL_PAGE_THRESHOLD, processes=None):
+        '''
+        :param laparams: `pdfminer.layout.LAParams`, defaults if None
+        :param use_mmap: map files given by path instead of reading them
+        :param caching: let pdfminer cache objects and resources
+        :param parallel_threshold: split documents with more pages than
+                                   this across processes; never if None
+        :param processes: size of the process pool, cpu count if None
+        '''
+        self.laparams = laparams
+        self.use_mmap = use_mmap
+        self.caching = caching
+        self.parallel_threshold = parallel_threshold
+        self.processes = processes
+        self.__pool = None
+        self.__closing = False
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_PDFTextEngine__pool'] = None
+        return state
+
+    def close(self):
+        '''
+        Stop the process pool used for long documents.
+        '''
+        if self.__pool is not None:
+            self.__pool.close()
+            self.__pool.join()
+            self.__pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def use_parallel(self, no_of_pages):
+        '''
+        Check whether a document is long enough to split it across
+        processes. Processes started by `multiprocessing`, such as the
+        workers of `workers.WorkerPool`, always stay serial.
+        '''
+        return (self.parallel_threshold is not None
+                and no_of_pages > self.parallel_threshold
+                and not in_child_process())
+
+    def __read_parallel(self, source, no_of_pages):
+        '''
+        Extract page ranges in a process pool and join them in order.
+        The pool is kept for later documents until `close`, which also
+        runs at exit.
+        '''
+        if self.__pool is None:
+            self.__pool = mp.Pool(self.processes or mp.cpu_count())
+            if not self.__closing:
+                atexit.register(self.close)
+                self.__closing = True
+        workers = self.processes or mp.cpu_count()
+        step = max(1, -(-no_of_pages // workers))
+        options = {'laparams': self.laparams, 'use_mmap': self.use_mmap,
+                   'caching': self.caching}
+        source = shareable_source(source)
+        tasks = [(source, start, min(start + step, no_of_pages), options)
+                 for start in range(0, no_of_pages, step)]
+        pages = []
+        for texts, complete in self.__pool.map(_extract_page_range, tasks):
+            pages += texts
+            if not complete:
+                return pages, False
+        return pages, True
+
+    def open_document(self, pdffile):
+        '''
+        Parse the structure of an open pdf.
+
+        :param pdffile: binary file object
+        :return: object of `pdfminer.pdfdocument.PDFDocument`
+        '''
+        document = PDFDocument(PDFParser(pdffile), caching=self.caching)
+        if not document.is_extractable:
+            raise PDFTextExtractionNotAllowed(pdffile)
+        return document
+
+    def iter_page_texts(self, document, pages=None):
+        '''
+        Iterate over the text of pages, with one interpreter for all.
+
+        :param document: object of `pdfminer.pdfdocument.PDFDocument`
+        :param pages: iterable of `PDFPage`, all pages of the document
+                      if None
+        :return: iterator of strings
+        '''
+        if pages is None:
+            pages = PDFPage.create_pages(document)
+        resource_manager = PDFResourceManager(caching=self.caching)
+        fake_file_handle = io.StringIO()
+        converter = TextConverter(
+            resource_manager,
+            fake_file_handle,
+            codec='utf-8',
+            laparams=self.laparams or LAParams()
+        )
+        page_interpreter = PDFPageInterpreter(resource_manager, converter)
+        try:
+            for page in pages:
+                page_interpreter.process_page(page)
+                text = fake_file_handle.getvalue()
+                fake_file_handle.seek(0)
+                fake_file_handle.truncate()
+                yield text
+        finally:
+            # close open handles
+            converter.close()
+            fake_file_handle.close()
+
+    def iter_pages(self, source):
+        '''
+        Iterate over the text of each page of a pdf.
+
+        :param source: see `open_source`
+        :return: iterator of strings
+        '''
+        with open_source(source, self.use_mmap) as pdffile:
+            try:
+                for text in self.iter_page_texts(self.open_document(pdffile)):
+                    yield text
+            except PDFSyntaxError:
+                return
+
+    def read(self, source):
+        '''
+        Read a pdf in a single pass: the text of every page, the number
+        of pages and the document information. Documents longer than
+        `parallel_threshold` pages have their pages split across a
+        process pool.
+
+        :param source: see `open_source`
+        :return: `PdfContent`; `no_of_pages` is None if the file is broken
+        '''
+        pages = []
+        metadata = {}
+        with open_source(source, self.use_mmap) as pdffile:
+            try:
+                document = self.open_document(pdffile)
+                metadata = pdf_metadata(document)
+                no_of_pages = page_count(document)
+                if self.use_parallel(no_of_pages):
+                    pages, complete = self.__read_parallel(
+                        source, no_of_pages)
+                    if not complete:
+                        return PdfContent(pages, None, metadata)
+                else:
+                    for text in self.iter_page_texts(document):
+                        pages.append(text)
+            except PDFSyntaxError:
+                return PdfContent(pages, None, metadata)
+        return PdfContent(pages, len(pages), metadata)
+
+
+_ENGINE = PDFTextEngine()
+_ENGINES[PARALLEL_PAGE_THRESHOLD, None] = _ENGINE
+
+
+def get_engine(parallel_threshold=PARALLEL_PAGE_THRESHOLD, processes=None):
+    '''
+    Get the shared engine with some parallel options, so that its process
+    pool is reused by all documents.
+
+    :param parallel_threshold: see `PDFTextEngine`
+    :param processes: see `PDFTextEngine`
+    :return: object of `PDFTextEngine`
+    '''
+    key = parallel_threshold, processes
+    if key not in _ENGINES:
+        _ENGINES[key] = PDFTextEngine(parallel_threshold=parallel_threshold,
+                                      processes=processes)
+    return _ENGINES[key]
+
+
+def read_pdf(source, parallel_threshold=PARALLEL_PAGE_THRESHOLD,
+             processes=None):
+    '''
+    Read a pdf with a shared engine, see `PDFTextEngine.read`.
+
+    :param source: see `open_source`
+    :param parallel_threshold: split documents with more pages than this
+                               across processes; never if None
+    :param processes: size of the process pool, cpu count if None
+    :return: `PdfContent`
+    '''
+    return get_engine(parallel_threshold, processes).read(source)
+
+
+def iter_pages(source):
+    '''
+    Iterate over page texts with the default engine, see
+    `PDFTextEngine.iter_pages`.
+    '''
+    return _ENGINE.iter_pages(source)
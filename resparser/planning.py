@@ -0,0 +1,166 @@
+'''
+Planning of spaCy pipeline components. Each extracted field declares
+which annotations it needs from which Doc, so that every `nlp` call only
+runs the components that are actually used.
+'''
+TAGGER = 'tagger'
+PARSER = 'parser'
+NER = 'ner'
+# gazetteer tagger of ruler.py, only run when asked for
+RULER = 'gazetteer_tagger'
+MANAGED_COMPONENTS = (TAGGER, PARSER, NER, RULER)
+
+# Docs built by ResumeParser
+TEXT = 'text'                          # whole normalized text
+PROFILE = 'profile'                    # profile section, stop words removed
+EDUCATION = 'education'                # education section
+EXPERIENCE = 'experience'              # experience section
+EXPERIENCE_DATES = 'experience_dates'  # lines around the first job dates
+CUSTOM = 'custom'                      # raw text, custom NER model
+
+# stage -> components needed, per field
+# POS tags need the tagger, sentences the parser, noun chunks both
+FIELD_REQUIREMENTS = {
+    'name': {PROFILE: {TAGGER, NER}, TEXT: {TAGGER, NER}, CUSTOM: {NER}},
+    'email': {},
+    'mobile_number': {},
+    'skills': {TEXT: {TAGGER, PARSER}},
+    'college_name': {EDUCATION: {PARSER}, TEXT: {PARSER}},
+    'degree': {EDUCATION: {PARSER}, TEXT: {PARSER}},
+    'designation': {TEXT: {TAGGER, PARSER}, CUSTOM: {NER}},
+    'experience': {},
+    'company_names': {EXPERIENCE_DATES: {NER}, EXPERIENCE: {NER},
+                      TEXT: {NER}},
+    'no_of_pages': {},
+    'total_experience': {},
+}
+ALL_FIELDS = tuple(FIELD_REQUIREMENTS)
+
+# stages whose Docs are read for the phrases tagged by the gazetteer
+# tagger, per field
+RULER_STAGES = {
+    'skills': (TEXT,),
+    'designation': (TEXT,),
+    'college_name': (EDUCATION, TEXT),
+}
+
+# fields found by regular expressions over the plain text
+REGEX_FIELDS = ('email', 'mobile_number')
+
+PROFILES = {
+    'full': ALL_FIELDS,
+    'regex': REGEX_FIELDS,
+}
+
+
+def resolve(fields=None):
+    '''
+    Field names to extract, in the order of `ALL_FIELDS`.
+
+    :param fields: iterable of field names, the name of a profile or of
+                   one field, or None for all fields
+    :return: tuple of field names
+    :raise ValueError: for unknown fields and profiles
+    '''
+    if fields is None:
+        return ALL_FIELDS
+    if isinstance(fields, str):
+        if fields in PROFILES:
+            return PROFILES[fields]
+        if fields not in FIELD_REQUIREMENTS:
+            raise ValueError(f'unknown field or profile: {fields!r}, '
+                             f'profiles: {sorted(PROFILES)}')
+        fields = [fields]
+    fields = set(fields)
+    unknown = fields.difference(ALL_FIELDS)
+    if unknown:
+        raise ValueError(f'unknown fields: {sorted(unknown)}')
+    return tuple(field for field in ALL_FIELDS if field in fields)
+
+
+def plan(fields=ALL_FIELDS, single_pass=False, use_ruler=False):
+    '''
+    Components needed by each stage for some fields.
+
+    :param fields: see `resolve`
+    :param single_pass: sections are taken from the TEXT Doc, so it
+                        needs the components of every section
+    :param use_ruler: also run the gazetteer tagger where its phrases
+                      are read
+    :return: dictionary of stage to frozenset of component names;
+             stages without components are left out
+    '''
+    stages = {}
+    for field in resolve(fields):
+        requirements = [(stage, components) for stage, components
+                        in FIELD_REQUIREMENTS[field].items()]
+        if use_ruler:
+            requirements += [(stage, {RULER})
+                             for stage in RULER_STAGES.get(field, ())]
+        for stage, components in requirements:
+            if single_pass and stage != CUSTOM:
+                stage = TEXT
+            stages.setdefault(stage, set()).update(components)
+    return {stage: frozenset(components)
+            for stage, components in stages.items() if components}
+
+
+def uses(fields, stage, single_pass=False):
+    '''
+    Check whether some fields need the Doc of a stage at all, even
+    with only the tokenizer.
+    '''
+    for field in resolve(fields):
+        for field_stage in FIELD_REQUIREMENTS[field]:
+            if single_pass and field_stage != CUSTOM:
+                field_stage = TEXT
+            if field_stage == stage:
+                return True
+    return False
+
+
+def disabled(nlp, components):
+    '''
+    Names of the pipeline components to disable. Components that are not
+    managed here (custom ones) are always kept.
+
+    :param nlp: object of `spacy.language.Language`
+    :param components: components to keep
+    :return: list of component names
+    '''
+    return [name for name in nlp.pipe_names
+            if name in MANAGED_COMPONENTS and name not in components]
+
+
+def run(nlp, text, components):
+    '''
+    Process a text with only some components. Without components only
+    the tokenizer runs.
+
+    :param nlp: object of `spacy.language.Language`
+    :param text: string
+    :param components: components to run
+    :return: object of `spacy.tokens.doc.Doc`
+    '''
+    if not components:
+        return nlp.make_doc(text)
+    return nlp(text, disable=disabled(nlp, components))
+
+
+def pipe(nlp, texts, components, **kwargs):
+    '''
+    Same as `run` for a stream of texts, through `nlp.pipe`.
+
+    :param kwargs: passed on to `nlp.pipe` (batch_size, n_process)
+    :return: iterator of `spacy.tokens.doc.Doc`
+    '''
+    if not components:
+        return (nlp.make_doc(text) for text in texts)
+    return nlp.pipe(texts, disable=disabled(nlp, components), **kwargs)
+
+
+def needs(stages, stage, component):
+    '''
+    Check whether a stage of a plan needs a component.
+    '''
+    return component in stages.get(stage, ())
@@ -2,94 +2,433 @@
 '''
 Building a class to rank multiple resumes by education (the rank of university).
 '''
+import os
 from os import listdir
-import time
+import csv
+import heapq
+import json
+import math
 import multiprocessing as mp
+from bisect import insort
 from functools import partial
 import pandas as pd
+from . import constants as cs
+from . import instrument
+from . import planning
+from . import workers
+from .gazetteer import get_gazetteer
 from .resume_parser import ResumeParser
-# from .utils import timer
+
+COLUMNS = ['file name', 'highest degree', 'best school', 'rank']
+# streamed rows also keep the path relative to `res_path`, the level
+# of the most advanced degree and the years of experience
+STREAM_COLUMNS = COLUMNS + ['path', 'degree level', 'total experience']
+
+RESUME_EXTENSIONS = ('.pdf', '.docx', '.doc')
+
+# the only fields ranking reads, the parser skips everything else
+RANK_FIELDS = planning.resolve(['college_name', 'degree', 'total_experience'])
+
+
+def iter_resume_files(path, recursive=True):
+    '''
+    Lazily walk a folder for resume files.
+
+    :param path: folder to walk
+    :param recursive: also walk sub folders
+    :return: iterator of file paths relative to `path`, with '/'
+    '''
+    folders = ['']
+    while folders:
+        folder = folders.pop()
+        with os.scandir(os.path.join(path, folder)) as entries:
+            for entry in sorted(entries, key=lambda e: e.name):
+                name = folder + entry.name
+                if entry.is_dir():
+                    if recursive:
+                        folders.append(name + '/')
+                elif os.path.splitext(name)[1].lower() in RESUME_EXTENSIONS:
+                    yield name
+
+
+def degree_level(degrees):
+    '''
+    Level of the most advanced degree, see `constants.DEGREE_LEVELS`.
+
+    :param degrees: list of degrees from `utils.extract_degree`
+    :return: int, or None if no degree is known
+    '''
+    levels = [cs.EDUCATION_LEVEL.get(degree.split()[0].upper())
+              for degree in degrees or [] if degree.split()]
+    levels = [level for level in levels if level is not None]
+    return max(levels) if levels else None
+
+
+def rank_value(row):
+    '''
+    Rank of a row as a float, infinity when missing.
+    '''
+    try:
+        rank = float(row['rank'])
+    except (TypeError, ValueError):
+        return math.inf
+    return math.inf if math.isnan(rank) else rank
+
+
+def rank_key(row):
+    '''
+    Sort key of a row: best rank first, resumes without rank last.
+    '''
+    return (rank_value(row), row['path'])
+
+
+class RowWriter(object):
+    '''
+    Append rows to a .jsonl or .csv file, one line per resume, flushed
+    as soon as it is written so nothing is lost on a crash.
+    '''
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.csv = file_path.endswith('.csv')
+        self.__file = None
+        self.__writer = None
+
+    def read_rows(self):
+        '''
+        Rows already in the file.
+        '''
+        if not os.path.exists(self.file_path):
+            return []
+        with open(self.file_path, newline='') as file:
+            if self.csv:
+                rows = list(csv.DictReader(file))
+                for row in rows:
+                    row['rank'] = float(row['rank'] or 'nan')
+                return rows
+            rows = []
+            for line in file:
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    pass  # line cut by a crash
+            return rows
+
+    def write(self, row):
+        '''
+        Append one row.
+        '''
+        if self.__file is None:
+            new = (not os.path.exists(self.file_path)
+                   or os.path.getsize(self.file_path) == 0)
+            self.__file = open(self.file_path, 'a', newline='')
+            if self.csv:
+                self.__writer = csv.DictWriter(self.__file, STREAM_COLUMNS)
+                if new:
+                    self.__writer.writeheader()
+        if self.csv:
+            self.__writer.writerow(row)
+        else:
+            self.__file.write(json.dumps(row) + '\n')
+        self.__file.flush()
+
+    def close(self):
+        '''
+        Close the file.
+        '''
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+
+def best_schools(colleges):
+    '''
+    Best school of many resumes, with the ranks of all their colleges
+    looked up in one batch. As with `max` over a resume's colleges, the
+    school with the highest rank number is kept, or the first one when
+    none is ranked.
+
+    :param colleges: list with the college names of each resume
+    :return: list of (best school, rank), ('NaN', NaN) without college
+    '''
+    best = [('NaN', float('NaN'))] * len(colleges)
+    frame = pd.DataFrame(
+        [(number, name) for number, names in enumerate(colleges)
+         for name in names], columns=['resume', 'name'])
+    if frame.empty:
+        return best
+    frame['rank'] = get_gazetteer().university_index.ranks(
+        frame['name'].tolist())
+    schools = frame.groupby('resume').head(1).set_index('resume')
+    ranked = frame.dropna(subset=['rank'])
+    ranked = ranked.loc[ranked.groupby('resume')['rank'].idxmax()]
+    schools.update(ranked.set_index('resume'))
+    for number, name, rank in zip(schools.index, schools['name'],
+                                  schools['rank']):
+        best[number] = (name, float('NaN') if math.isnan(rank)
+                        else int(rank))
+    return best
+
+
+def rank_rows(file_names, outputs):
+    '''
+    Highest education and its ranking of many resumes at once.
+
+    :param file_names: names of the resume files
+    :param outputs: extracted data from `ResumeParser`, one per file
+    :return: list of dictionaries with one value per column of
+             `STREAM_COLUMNS`
+    '''
+    rows = []
+    for file_name, output in zip(file_names, outputs):
+        row = {'file name': file_name.split('.')[0], 'path': file_name,
+               'degree level': degree_level(output['degree']),
+               'total experience': output['total_experience']}
+        try:
+            row['highest degree'] = output['degree'][0]
+        except (IndexError, TypeError):
+            row['highest degree'] = 'NaN'
+        rows.append(row)
+    schools = best_schools([list(output.get('college_name') or ())
+                            for output in outputs])
+    for row, (school, rank) in zip(rows, schools):
+        row['best school'] = school
+        row['rank'] = rank
+    return rows
+
+
+def rank_row(file_name, output):
+    '''
+    Highest education and its ranking of one resume.
+
+    :param file_name: name of the resume file
+    :param output: extracted data from `ResumeParser`
+    :return: dictionary with one value per column of `STREAM_COLUMNS`
+    '''
+    return rank_rows([file_name], [output])[0]
+
+
+def get_rank_info(path, cache, file_name):
+    '''
+    Extract info from parser class. Get highest education and its ranking.
+    Runs in pool workers, so the whole row is returned at once, with the
+    timings for the metrics sinks of the parent process.
+
+    :return: tuple of (row, seconds spent per stage, bytes allocated per
+             stage or None)
+    '''
+    with instrument.muted():
+        parser = ResumeParser(path + file_name, cache=cache,
+                              fields=RANK_FIELDS)
+    return (rank_row(file_name, parser.get_extracted_data()),
+            parser.get_timings(), parser.get_allocations())
+
 
 class ResumeRank(object):
     '''
     Main class for ranking.
     '''
 
-    def __init__(self, res_path='./resume/', multiproc=True):
+    def __init__(self, res_path='./resume/', multiproc=True, cache=None,
+                 pool=None):
         self.path = res_path
-        manager = mp.Manager()
+        self.cache = cache  # optional cache.ResultCache
         self.multiproc = multiproc
-        if self.multiproc:
-            self.res_dic = {
-                'file name': manager.list(),
-                'highest degree': manager.list(),
-                'best school': manager.list(),
-                'rank': manager.list()
-            }
-            self.ncount = manager.Value('i', 1)
-        else:
-            self.res_dic = {
-                'file name': [],
-                'highest degree': [],
-                'best school': [],
-                'rank': []
-            }
-            self.ncount = 1
+        # workers.WorkerPool, the shared warm pool if None
+        self.pool = pool
+        self.rows = []
         self.result = None
+        # rows of `stream`, kept sorted by rank
+        self.ranking = []
+        # seconds per stage of each resume parsed by `run` and `stream`,
+        # see instrument.py
+        self.timings = []
+        # aggregated timings of the last run, also kept by `top_k`
+        self.timing_stats = instrument.TimingStats()
 
         pd.set_option('display.max_columns', None)
         pd.set_option('display.width', None)
 
-    def get_rank_info(self, res_dict, count, total_file_num, file_name):
+    def get_rank_info(self, file_name):
         '''
         Extract info from parser class. Get highest education and its ranking.
         '''
-        start_time = time.time()
-        output = ResumeParser(self.path + file_name).get_extracted_data()
+        return get_rank_info(self.path, self.cache, file_name)[0]
+
+    def __cached_files(self, file_names):
+        '''
+        Add rows of resumes already in the cache, before any pdf or nlp
+        work. Return the file names left to parse.
+        '''
+        if self.cache is None:
+            return file_names
+        pending = []
+        cached = {}
+        for file_name in file_names:
+            output = self.cache.lookup(self.path + file_name,
+                                       fields=RANK_FIELDS)
+            if output is None:
+                pending.append(file_name)
+            else:
+                cached[file_name] = output
+        self.rows += rank_rows(list(cached), list(cached.values()))
+        if len(pending) < len(file_names):
+            print(f'files found in cache: {len(file_names) - len(pending)}')
+        return pending
 
-        res_dict['file name'].append(file_name.split('.')[0])
-        try:
-            res_dict['highest degree'].append(output['degree'][0])
-        except IndexError:
-            res_dict['highest degree'].append('NaN')
-        try:
-            best_school = max(output['college_name'],
-                              key=output['college_name'].get)
-            res_dict['best school'].append(best_school)
-            res_dict['rank'].append(output['college_name'][best_school])
-        except KeyError:
-            res_dict['best school'].append('NaN')
-            res_dict['rank'].append(float('NaN'))
-
-        print(f'file processed: {count.value}/{total_file_num}. \
-            --- {(time.time() - start_time):.2f} seconds ---')
-        count.value += 1
-
-    # @timer
     def run(self):
         '''
         Main function to process the resumes ranking and sorting.
         '''
-
-        total_file_num = len(listdir(self.path))
         print('\nStart calculating ranks...')
         print('Total time is not accurate for multiprocessing...\n')
+        self.rows = []
+        self.timings = []
+        self.timing_stats = instrument.TimingStats()
+        file_names = self.__cached_files(listdir(self.path))
+        total_file_num = len(file_names)
+        func = partial(get_rank_info, self.path, self.cache)
         if self.multiproc:  # use multiprocessing
-            func = partial(self.get_rank_info, self.res_dic,
-                           self.ncount, total_file_num)
+            # warm workers are kept between runs, see workers.py
+            pool = self.pool or workers.get_pool()
+            self.__collect(pool.imap_unordered(func, file_names),
+                           total_file_num)
+        else:  # don't use multiprocessing
+            self.__collect(map(func, file_names), total_file_num)
 
-            with mp.Pool(mp.cpu_count()) as pool:
-                pool.map(func, listdir(self.path))
+        self.result = pd.DataFrame(self.rows, columns=COLUMNS).sort_values(
+            by=['rank'], ignore_index=True)
 
-            self.res_dic = {k: list(v) for k, v in self.res_dic.items()}
+    def __record(self, path, row, timings, allocations, keep=True):
+        '''
+        Aggregate the timings of one resume and send them to the
+        metrics sinks of this process.
 
-        else:  # don't use multiprocessing
-            for file_name in listdir(self.path):
-                self.get_rank_info(self.res_dic, self.ncount,
-                                   total_file_num, file_name)
+        :param keep: also keep them in `self.timings`
+        '''
+        if keep:
+            self.timings.append(timings)
+        self.timing_stats.add(timings)
+        instrument.emit(path + row['path'], timings, allocations)
 
-        self.result = pd.DataFrame(self.res_dic).sort_values(
-            by=['rank'], ignore_index=True)
+    def __collect(self, results, total_file_num):
+        '''
+        Gather rows as they are ready and report progress.
+        '''
+        for count, (row, timings, allocations) in enumerate(results, 1):
+            self.rows.append(row)
+            self.__record(self.path, row, timings, allocations)
+            print(f'file processed: {count}/{total_file_num}. \
+            --- {timings[instrument.TOTAL]:.2f} seconds ---')
+
+    def stream(self, output='ranking.jsonl', recursive=True, skip_done=True):
+        '''
+        Rank a large folder incrementally. Resumes are found lazily
+        (recursively by default), and each row is appended to `output`
+        (.jsonl or .csv) and yielded as soon as it is ready, while
+        `self.ranking` stays sorted by rank. Files already in `output`,
+        e.g. before a crash, are skipped.
+
+        :param output: file to append rows to
+        :param recursive: also rank resumes in sub folders
+        :param skip_done: skip files already in `output`
+        :return: iterator of rows
+        '''
+        writer = RowWriter(output)
+        self.ranking = []
+        self.timings = []
+        self.timing_stats = instrument.TimingStats()
+        done = set()
+        if skip_done:
+            for row in writer.read_rows():
+                done.add(row['path'])
+                insort(self.ranking, (rank_key(row), row))
+        file_names = (name for name in iter_resume_files(self.path, recursive)
+                      if name not in done)
+        path = os.path.join(self.path, '')
+        func = partial(get_rank_info, path, self.cache)
+        if self.multiproc:
+            pool = self.pool or workers.get_pool()
+            results = pool.imap_unordered(func, file_names)
+        else:
+            results = map(func, file_names)
+        try:
+            for count, (row, timings, allocations) in enumerate(results, 1):
+                writer.write(row)
+                insort(self.ranking, (rank_key(row), row))
+                self.__record(path, row, timings, allocations)
+                print(f'file processed: {count + len(done)}. \
+            --- {timings[instrument.TOTAL]:.2f} seconds ---')
+                yield row
+        finally:
+            writer.close()
+
+    def top_k(self, k=10, min_degree=None, min_experience=None,
+              recursive=False):
+        '''
+        Keep only the best `k` resumes by university rank, with memory
+        bounded by `k` whatever the number of files. Timings are only
+        aggregated, in `self.timing_stats`.
+
+        :param k: number of rows to keep
+        :param min_degree: lowest degree level accepted, a key of
+                           `constants.DEGREE_LEVELS` or an int
+        :param min_experience: lowest total experience in years
+        :param recursive: also rank resumes in sub folders
+        :return: `pandas.DataFrame` of the best rows, also in self.result
+        '''
+        if isinstance(min_degree, str):
+            min_degree = cs.DEGREE_LEVELS[min_degree.lower()]
+        path = os.path.join(self.path, '')
+        func = partial(get_rank_info, path, self.cache)
+        file_names = iter_resume_files(self.path, recursive)
+        if self.multiproc:
+            pool = self.pool or workers.get_pool()
+            results = pool.imap_unordered(func, file_names)
+        else:
+            results = map(func, file_names)
+
+        # max-heap on rank: the worst kept row is popped first
+        heap = []
+        self.timings = []
+        self.timing_stats = instrument.TimingStats()
+        for count, (row, timings, allocations) in enumerate(results):
+            self.__record(path, row, timings, allocations, keep=False)
+            if min_degree is not None and (
+                    row['degree level'] is None
+                    or row['degree level'] < min_degree):
+                continue
+            if min_experience is not None and (
+                    (row['total experience'] or 0) < min_experience):
+                continue
+            item = (-rank_value(row), -count, row)
+            if len(heap) < k:
+                heapq.heappush(heap, item)
+            elif k > 0:
+                heapq.heappushpop(heap, item)
+
+        rows = [row for _, _, row in sorted(heap, reverse=True)]
+        self.result = pd.DataFrame(rows, columns=COLUMNS)
+        return self.result
+
+    def timing_summary(self):
+        '''
+        Where the time per resume goes: count, mean, p50 and p95 seconds
+        of each stage over the last run, slowest median first.
+
+        :return: `pandas.DataFrame` with one row per stage
+        '''
+        summary = pd.DataFrame.from_dict(
+            self.timing_stats.summary(), orient='index')
+        if summary.empty:
+            return summary
+        return summary.sort_values(by=['p50'], ascending=False)
+
+    def ranked_rows(self):
+        '''
+        Rows of `stream` so far, best rank first.
+        '''
+        return [row for _, row in self.ranking]
 
     def export_result(self, print_res=True, save=True, path='.'):
         '''
@@ -3,12 +3,16 @@
 Main program for ResumeParser.
 '''
 import os
-import multiprocessing as mp
-import io
 import pprint
-import spacy
+from itertools import repeat, tee
 from spacy.matcher import Matcher
+from . import instrument
+from . import models
+from . import pdf
+from . import planning
+from . import ruler
 from . import utils
+from . import workers
 
 class ResumeParser(object):
     '''Main class'''
@@ -17,15 +21,155 @@ class ResumeParser(object):
             self,
             resume,
             skills_file=None,
-            custom_regex=None
+            custom_regex=None,
+            nlp=None,
+            custom_nlp=None,
+            single_pass=False,
+            cache=None,
+            track_allocations=False,
+            fields=None,
+            pdf_parallel_threshold=pdf.PARALLEL_PAGE_THRESHOLD,
+            pdf_processes=None,
+            use_ruler=False
     ):
-        nlp = spacy.load('en_core_web_sm')
-        custom_nlp = spacy.load(os.path.dirname(
-            os.path.abspath(__file__)) + '/model')
+        '''
+        :param fields: names of the fields to extract (see
+                       `planning.ALL_FIELDS`) or a profile name such as
+                       'regex'; all fields if None. Only the text
+                       extraction, sections and nlp runs these fields
+                       depend on are done, other fields stay None.
+        :param pdf_parallel_threshold: split pdfs with more pages than
+                                       this across processes; never if None
+        :param pdf_processes: processes used for long pdfs, cpu count if
+                              None
+        :param use_ruler: tag skills, job titles and universities with
+                          the gazetteer tagger of ruler.py, added to the
+                          pipeline if missing
+        '''
+        # seconds per stage, see instrument.py
+        self.__timings = instrument.Timings(track_allocations)
+        fields = planning.resolve(fields)
+        # cached results skip all pdf and nlp work, see cache.py
+        key = None
+        if cache is not None:
+            with self.__timings.stage(instrument.CACHE):
+                key = cache.key(resume, nlp=nlp, custom_nlp=custom_nlp,
+                                skills_file=skills_file,
+                                custom_regex=custom_regex,
+                                single_pass=single_pass,
+                                fields=(None if fields == planning.ALL_FIELDS
+                                        else fields),
+                                use_ruler=use_ruler)
+                details = cache.get(key)
+            if details is not None:
+                self.__details = details
+                self.__finish(resume)
+                return
+            with self.__timings.stage(instrument.CACHE):
+                document = cache.get_document(key)
+        if key is None or document is None:
+            document = self.__timings.call(
+                instrument.EXTRACT_TEXT, utils.extract_document, resume,
+                utils.get_extension(resume), pdf_parallel_threshold,
+                pdf_processes)
+        self.__setup(resume, skills_file, custom_regex, nlp, custom_nlp,
+                     single_pass, fields, use_ruler)
+        self.__parse(document)
+        if cache is not None:
+            cache.put(key, self.__details, document)
+        self.__finish(resume)
+
+    @classmethod
+    def parse_many(
+            cls,
+            resumes,
+            batch_size=32,
+            n_process=1,
+            skills_file=None,
+            custom_regex=None,
+            nlp=None,
+            custom_nlp=None,
+            single_pass=False,
+            track_allocations=False,
+            fields=None,
+            pdf_parallel_threshold=pdf.PARALLEL_PAGE_THRESHOLD,
+            pdf_processes=None,
+            use_ruler=False
+    ):
+        '''
+        Parse many resumes, streaming their texts through `nlp.pipe` for
+        both models. Use with `single_pass=True` to get one pipeline run
+        per resume. Batched nlp calls are not part of the timings.
 
+        :param resumes: iterable of file paths or `io.BytesIO` objects
+        :param batch_size: number of texts per spaCy batch
+        :param n_process: number of processes used by `nlp.pipe`
+        :param fields: fields to extract, see `ResumeParser`
+        :param pdf_parallel_threshold: see `ResumeParser`
+        :param pdf_processes: see `ResumeParser`
+        :param use_ruler: see `ResumeParser`
+        :return: iterator of extracted data, in input order
+        '''
+        fields = planning.resolve(fields)
+
+        def extract(resume):
+            timings = instrument.Timings(track_allocations)
+            document = timings.call(
+                instrument.EXTRACT_TEXT, utils.extract_document, resume,
+                utils.get_extension(resume), pdf_parallel_threshold,
+                pdf_processes)
+            return resume, document, timings
+
+        documents, texts_norm, texts_raw = tee(map(extract, resumes), 3)
+        stages = planning.plan(fields, single_pass=single_pass,
+                               use_ruler=use_ruler)
+        # Docs no field needs are not built at all
+        docs = repeat(None)
+        if planning.uses(fields, planning.TEXT, single_pass):
+            model = nlp if nlp is not None else models.get_nlp()
+            if use_ruler:
+                ruler.add_to_pipe(model)
+            docs = planning.pipe(
+                model,
+                (' '.join(document.text.split())
+                 for _, document, _ in texts_norm),
+                stages.get(planning.TEXT),
+                batch_size=batch_size, n_process=n_process)
+        custom_docs = repeat(None)
+        if planning.uses(fields, planning.CUSTOM):
+            custom_docs = planning.pipe(
+                custom_nlp if custom_nlp is not None
+                else models.get_custom_nlp(),
+                (document.text for _, document, _ in texts_raw),
+                stages.get(planning.CUSTOM),
+                batch_size=batch_size, n_process=n_process)
+        for (resume, document, timings), doc, custom_doc in zip(
+                documents, docs, custom_docs):
+            parser = cls.__new__(cls)
+            parser.__timings = timings
+            parser.__setup(resume, skills_file, custom_regex, nlp,
+                           custom_nlp, single_pass, fields, use_ruler)
+            parser.__parse(document, doc, custom_doc)
+            parser.__finish(resume)
+            yield parser.get_extracted_data()
+
+    def __setup(self, resume, skills_file, custom_regex, nlp, custom_nlp,
+                single_pass, fields, use_ruler):
+        '''
+        Store options and models.
+        '''
+        # models are loaded on first use and shared by the whole
+        # process, see models.py
+        self.__nlp_option = nlp
+        self.__custom_nlp_option = custom_nlp
+        self.__single_pass = single_pass
+        self.__fields = fields
+        self.__use_ruler = use_ruler
+        # components each Doc needs, see planning.py
+        self.__plan = planning.plan(fields, single_pass=single_pass,
+                                    use_ruler=use_ruler)
         self.__skills_file = skills_file
         self.__custom_regex = custom_regex
-        self.__matcher = Matcher(nlp.vocab)
         self.__details = {
             'name': None,
             'email': None,
@@ -40,44 +184,227 @@ class ResumeParser(object):
             'total_experience': None,
         }
         self.__resume = resume
-        if not isinstance(self.__resume, io.BytesIO):
-            ext = os.path.splitext(self.__resume)[1].split('.')[1]
-        else:
-            ext = self.__resume.name.split('.')[1]
-        self.__text_raw = utils.extract_text(self.__resume, '.' + ext)
+        # Docs and sections, computed on first use
+        self.__values = {}
+
+    def __parse(self, document, doc=None, custom_doc=None):
+        '''
+        Extract the requested fields. Docs, sections and other steps are
+        only computed when a field uses them.
+
+        :param document: `utils.Document` extracted from the resume
+        :param doc: Doc of the normalized text from the default model
+        :param custom_doc: Doc of the raw text from the custom model
+        '''
+        self.__document = document
+        self.__text_raw = document.text
         self.__text = ' '.join(self.__text_raw.split())
-        self.__nlp = nlp(self.__text)
-        self.__noun_chunks = list(self.__nlp.noun_chunks)
-        self.__nlp_sents = [sent.string.strip() for sent in self.__nlp.sents]
-        self.__custom_nlp = custom_nlp(self.__text_raw)
-        self.__cust_ent = utils.extract_entities_form_model(self.__custom_nlp)
-        # info split by sections
-        # profile section
-        self.__sections = utils.extract_entity_sections(self.__text_raw)
-        self.__text_profile = utils.extract_section_text(
-            'profile', self.__sections)
-        self.__nlp_profile = nlp(self.__text_profile)
-        self.__nlp_profile = utils.preprocess(self.__nlp_profile, nlp)
-        # education section
-        self.__text_edu = utils.extract_section_text(
-            'education', self.__sections)
-        self.__nlp_edu = nlp(self.__text_edu)
-        self.__nlp_sents_edu = [sent.string.strip()
-                                for sent in self.__nlp_edu.sents]
-        # experience section
-        self.__text_experience = utils.extract_section_text(
-            'experience', self.__sections)
-        self.__nlp_experience = nlp(self.__text_experience)
-        [self.__exp_date, self.__exp_dic] = utils.get_total_experience(
-            self.__text_experience)
+        if doc is not None:
+            self.__values['doc'] = doc
+        if custom_doc is not None:
+            self.__values['custom_doc'] = custom_doc
+        extractors = {
+            'name': self.__get_name,
+            'email': self.__get_email,
+            'mobile_number': self.__get_mobile_number,
+            'skills': self.__get_skills,
+            'college_name': self.__get_college_name,
+            'degree': self.__get_degree,
+            'designation': self.__get_designation,
+            'experience': self.__get_experience,
+            'company_names': self.__get_company_names,
+            'no_of_pages': self.__get_no_of_pages,
+            'total_experience': self.__get_total_experience,
+        }
+        for field in self.__fields:
+            self.__details[field] = extractors[field]()
+
+    def __lazy(self, name, compute):
+        '''
+        Value computed on first use and kept.
+        '''
+        if name not in self.__values:
+            self.__values[name] = compute()
+        return self.__values[name]
+
+    def __model(self):
+        '''
+        Default spaCy model, with the gazetteer tagger if used.
+        '''
+        model = self.__nlp_option
+        if model is None:
+            model = models.get_nlp()
+        if self.__use_ruler:
+            ruler.add_to_pipe(model)
+        return model
+
+    def __custom_model(self):
+        '''
+        Custom NER model.
+        '''
+        if self.__custom_nlp_option is None:
+            return models.get_custom_nlp()
+        return self.__custom_nlp_option
+
+    def __run(self, stage, text):
+        '''
+        Process a text with the components planned for a stage.
+        '''
+        with self.__timings.stage(instrument.nlp_stage(stage)):
+            return planning.run(self.__model(), text,
+                                self.__plan.get(stage))
+
+    def __extract(self, func, *args, **kwargs):
+        '''
+        Call an extract_* function of utils, timed under its name.
+        '''
+        return self.__timings.call(func.__name__, func, *args, **kwargs)
+
+    def __finish(self, resume):
+        '''
+        Record the total time and send the timings to the sinks.
+        '''
+        self.__timings.finish()
+        instrument.emit(resume, self.__timings.timings,
+                        self.__timings.allocations)
+
+    def __needs(self, stage, component):
+        '''
+        Check whether a stage runs a component. In single-pass mode all
+        sections come from the TEXT Doc.
+        '''
+        if self.__single_pass and stage != planning.CUSTOM:
+            stage = planning.TEXT
+        return planning.needs(self.__plan, stage, component)
+
+    def __doc(self):
+        '''
+        Doc of the whole normalized text.
+        '''
+        return self.__lazy('doc', lambda: self.__run(planning.TEXT,
+                                                     self.__text))
+
+    def __custom_entities(self):
+        '''
+        Entities found by the custom NER model.
+        '''
+        def compute():
+            with self.__timings.stage(instrument.CUSTOM_NER):
+                custom_doc = self.__values.get('custom_doc')
+                if custom_doc is None:
+                    custom_doc = planning.run(
+                        self.__custom_model(), self.__text_raw,
+                        self.__plan.get(planning.CUSTOM))
+                return utils.extract_entities_form_model(custom_doc)
+        return self.__lazy('custom_entities', compute)
+
+    def __noun_chunks(self):
+        '''
+        Noun chunks of the whole text, empty without the parser.
+        '''
+        if not self.__needs(planning.TEXT, planning.PARSER):
+            return []
+        return self.__lazy('noun_chunks',
+                           lambda: list(self.__doc().noun_chunks))
+
+    def __sents(self, stage):
+        '''
+        Sentences of the whole text or of a section, as strings; empty
+        without the parser.
+        '''
+        if not self.__needs(stage, planning.PARSER):
+            return []
+        doc = (self.__doc() if stage == planning.TEXT
+               else self.__section_doc(stage))
+        return self.__lazy('sents:' + stage, lambda: [
+            sent.string.strip() for sent in doc.sents])
+
+    def __sections(self):
+        '''
+        Split the raw text by sections and find the experience dates.
+        '''
+        def compute():
+            with self.__timings.stage(instrument.SECTIONS):
+                sections = utils.extract_entity_sections(self.__text_raw)
+                self.__text_profile = utils.extract_section_text(
+                    'profile', sections)
+                self.__text_edu = utils.extract_section_text(
+                    'education', sections)
+                self.__text_experience = utils.extract_section_text(
+                    'experience', sections)
+                [self.__exp_date, self.__exp_dic] = \
+                    utils.get_total_experience(self.__text_experience)
+            return sections
+        return self.__lazy('sections', compute)
+
+    def __section_doc(self, stage):
+        '''
+        Doc of one section: PROFILE, EDUCATION, EXPERIENCE or
+        EXPERIENCE_DATES.
+        '''
+        self.__sections()
+        if self.__single_pass:
+            def compute():
+                with self.__timings.stage(instrument.SECTIONS):
+                    return self.__section_docs_from_doc()
+            return self.__lazy('section_docs', compute)[stage]
+        return self.__lazy('doc:' + stage,
+                           lambda: self.__parse_section(stage))
+
+    def __parse_section(self, stage):
+        '''
+        Parse one section text separately.
+        '''
+        if stage == planning.PROFILE:
+            # only stop words and punctuation are needed before
+            # preprocessing
+            with self.__timings.stage(instrument.nlp_stage(stage)):
+                return utils.preprocess(
+                    self.__model().make_doc(self.__text_profile),
+                    self.__model(),
+                    self.__plan.get(planning.PROFILE, frozenset()))
+        if stage == planning.EDUCATION:
+            return self.__run(stage, self.__text_edu)
+        if stage == planning.EXPERIENCE:
+            return self.__run(stage, self.__text_experience)
+        # lines around the first experience date
         try:
-            self.__nlp_exp_dic = nlp(
-                ' '.join(list(self.__exp_dic.values())[0]))
+            return self.__run(stage,
+                              ' '.join(list(self.__exp_dic.values())[0]))
         except IndexError:
-            self.__nlp_exp_dic = nlp('')
+            return self.__run(stage, '')
 
-        self.__get_basic_details()
+    def __section_docs_from_doc(self):
+        '''
+        Single-pass mode. Take each section from the Doc of the whole
+        text instead of running the pipeline again.
 
+        :return: dictionary of stage to Doc
+        '''
+        doc = self.__doc()
+        offsets = utils.extract_entity_sections(self.__text_raw, offsets=True)
+        docs = {}
+        # profile section
+        docs[planning.PROFILE] = utils.preprocess_section(
+            doc, utils.extract_section_lines('profile', offsets))
+        # education section
+        docs[planning.EDUCATION] = utils.section_doc(
+            doc, utils.extract_section_lines('education', offsets))
+        # experience section
+        exp_offsets = utils.extract_section_lines('experience', offsets)
+        docs[planning.EXPERIENCE] = utils.section_doc(doc, exp_offsets)
+        # lines around the first experience date
+        exp_offsets_dic = []
+        for date, phrases in list(self.__exp_dic.items())[:1]:
+            phrases = {' '.join(phrase.split()) for phrase in phrases}
+            for (start, end), line in zip(
+                    exp_offsets, self.__text_experience.split('\n')):
+                if (' '.join(line.split()) in phrases or
+                        ' '.join(line.replace(date, '').split()) in phrases):
+                    exp_offsets_dic.append((start, end))
+        docs[planning.EXPERIENCE_DATES] = utils.section_doc(
+            doc, exp_offsets_dic)
+        return docs
 
     def get_extracted_data(self):
         '''
@@ -85,112 +412,119 @@ class ResumeParser(object):
         '''
         return self.__details
 
-    # @utils.timer
-    def __get_basic_details(self):
+    def get_timings(self):
         '''
-        Get profile info.
+        Seconds spent in each stage, see instrument.py.
         '''
-        name = utils.extract_name(self.__nlp_profile, matcher=self.__matcher)
-        if not name:
-            name = utils.extract_name(self.__nlp, matcher=self.__matcher)
+        return self.__timings.timings
 
-        email = utils.extract_email(self.__text)
-        mobile = utils.extract_mobile_number(self.__text, self.__custom_regex)
-        # get education info
-        degree = utils.extract_degree(self.__nlp_sents_edu)
-        if not degree:
-            degree = utils.extract_degree(self.__nlp_sents)
+    def get_allocations(self):
+        '''
+        Bytes allocated in each stage, None unless `track_allocations`.
+        '''
+        return self.__timings.allocations
 
-        college_name = utils.extract_college_name(self.__nlp_sents_edu)
-        if not college_name:
-            college_name = utils.extract_college_name(self.__nlp_sents)
+    def __get_name(self):
+        try:
+            return self.__custom_entities()['Name'][0]
+        except (IndexError, KeyError):
+            pass
+        matcher = Matcher(self.__model().vocab)
+        name = self.__extract(utils.extract_name,
+                              self.__section_doc(planning.PROFILE),
+                              matcher=matcher)
+        if not name:
+            name = self.__extract(utils.extract_name, self.__doc(),
+                                  matcher=matcher)
+        return name
 
-        # get work experience info
-        designation = utils.extract_designation(self.__nlp, self.__noun_chunks)
+    def __get_email(self):
+        return self.__extract(utils.extract_email, self.__text)
 
-        company_names = utils.extract_company_name(self.__nlp_exp_dic)
-        if not company_names:
-            company_names = utils.extract_company_name(self.__nlp_experience)
-        if not company_names:
-            company_names = utils.extract_company_name(self.__nlp)
+    def __get_mobile_number(self):
+        return self.__extract(utils.extract_mobile_number, self.__text,
+                              self.__custom_regex)
 
-        # get skill info
-        skills = utils.extract_skills(
-            self.__nlp,
-            self.__noun_chunks,
+    def __get_skills(self):
+        return self.__extract(
+            utils.extract_skills,
+            self.__doc(),
+            self.__noun_chunks(),
             self.__skills_file
         )
 
-        # extract name
-        try:
-            self.__details['name'] = self.__cust_ent['Name'][0]
-        except (IndexError, KeyError):
-            self.__details['name'] = name
-
-        # extract email
-        self.__details['email'] = email
+    def __get_college_name(self):
+        college_name = self.__extract(utils.extract_college_name,
+                                      self.__sents(planning.EDUCATION),
+                                      self.__section_doc(planning.EDUCATION))
+        if not college_name:
+            college_name = self.__extract(utils.extract_college_name,
+                                          self.__sents(planning.TEXT),
+                                          self.__doc())
+        return college_name
 
-        # extract mobile number
-        self.__details['mobile_number'] = mobile
+    def __get_degree(self):
+        degree = self.__extract(utils.extract_degree,
+                                self.__sents(planning.EDUCATION))
+        if not degree:
+            degree = self.__extract(utils.extract_degree,
+                                    self.__sents(planning.TEXT))
+        return degree
 
-        # extract skills
-        self.__details['skills'] = skills
+    def __get_designation(self):
+        designation = self.__extract(utils.extract_designation, self.__doc(),
+                                     self.__noun_chunks())
+        try:
+            designation.extend(self.__custom_entities()['Designation'])
+        except KeyError:
+            pass
+        return designation
 
-        # extract college name
-        self.__details['college_name'] = college_name
+    def __get_experience(self):
+        self.__sections()
+        return self.__exp_dic
 
-        # extract education Degree
-        self.__details['degree'] = degree
+    def __get_company_names(self):
+        company_names = self.__extract(
+            utils.extract_company_name,
+            self.__section_doc(planning.EXPERIENCE_DATES))
+        if not company_names:
+            company_names = self.__extract(
+                utils.extract_company_name,
+                self.__section_doc(planning.EXPERIENCE))
+        if not company_names:
+            company_names = self.__extract(utils.extract_company_name,
+                                           self.__doc())
+        return company_names
 
-        # extract experience
-        self.__details['experience'] = self.__exp_dic
-        try:
-            exp = round(self.__exp_date / 12, 2)
-            self.__details['total_experience'] = exp
-        except KeyError:
-            self.__details['total_experience'] = 0
+    def __get_no_of_pages(self):
+        return self.__document.no_of_pages
 
-        # extract designation
-        self.__details['designation'] = designation
+    def __get_total_experience(self):
+        self.__sections()
         try:
-            self.__details['designation'].extend(
-                self.__cust_ent['Designation'])
+            return round(self.__exp_date / 12, 2)
         except KeyError:
-            pass
-
-        self.__details['company_names'] = company_names
-
-        self.__details['no_of_pages'] = utils.get_number_of_pages(
-            self.__resume
-        )
-        return
+            return 0
 
 
 def resume_result_wrapper(resume):
     '''
-    Wrapper for multiprocessing
+    Wrapper for multiprocessing. spaCy spans cannot be pickled, so they
+    are returned as strings.
     '''
     parser = ResumeParser(resume)
-    return parser.get_extracted_data()
+    return utils.jsonable(parser.get_extracted_data())
 
 
 if __name__ == '__main__':
-    pool = mp.Pool(mp.cpu_count())
-
     resumes = []
-    data = []
     for root, directories, filenames in os.walk('resumes/'):
         for filename in filenames:
             file = os.path.join(root, filename)
             resumes.append(file)
 
-    results = [
-        pool.apply_async(
-            resume_result_wrapper,
-            args=(x,)
-        ) for x in resumes
-    ]
-
-    results = [p.get() for p in results]
+    # warm workers load the models once, see workers.py
+    results = list(workers.get_pool().imap(resume_result_wrapper, resumes))
 
     pprint.pprint(results)
@@ -0,0 +1,191 @@
+'''
+Optional spaCy pipeline component tagging gazetteer phrases (skills, job
+titles, universities) with a `PhraseMatcher` while a Doc is parsed, so
+matching runs inside `nlp.pipe` batches.
+
+    from resparser import ResumeParser, models, ruler
+    ruler.add_to_pipe(models.get_nlp(), 'gazetteer_patterns')
+    ResumeParser('resume.pdf', use_ruler=True)
+
+The tagger only runs for parsers created with `use_ruler=True`, which
+also add it to their pipeline when it is missing.
+
+Matches are stored in `doc._.gazetteer_matches` as a list of
+(label, name, start, end), where name is the entry of the csv file.
+The extract_* functions of utils use them when present. The patterns
+are compiled from the bundled csv files once and saved to disk.
+'''
+import json
+import os
+from spacy.language import Language
+from spacy.matcher import PhraseMatcher
+from spacy.tokens import Doc
+from . import planning
+from .gazetteer import get_gazetteer
+
+SKILL = 'SKILL'
+TITLE = 'TITLE'
+UNIVERSITY = 'UNIVERSITY'
+LABELS = (SKILL, TITLE, UNIVERSITY)
+
+# labels whose one-word matches must not be stop words
+STOP_WORD_LABELS = (SKILL, TITLE)
+
+EXTENSION = 'gazetteer_matches'
+PATTERNS_FILE = 'patterns.jsonl'
+META_FILE = 'meta.json'
+
+if not Doc.has_extension(EXTENSION):
+    Doc.set_extension(EXTENSION, default=None)
+
+
+def gazetteer_phrases(gazetteer=None):
+    '''
+    Phrases of every label, from the bundled csv files.
+
+    :return: iterator of (label, phrase)
+    '''
+    gazetteer = gazetteer or get_gazetteer()
+    for skill in gazetteer.skill_index.phrases:
+        yield SKILL, skill
+    for title in gazetteer.titles:
+        yield TITLE, title
+    for college in gazetteer.universities:
+        yield UNIVERSITY, college
+    for college in gazetteer.ranked_universities:
+        yield UNIVERSITY, college
+
+
+class GazetteerTagger(object):
+    '''
+    Pipeline component matching gazetteer phrases on lower-cased tokens.
+    '''
+    name = planning.RULER
+
+    def __init__(self, vocab, patterns=None):
+        '''
+        :param vocab: `spacy.vocab.Vocab` of the pipeline
+        :param patterns: iterable of (label, name, words); see `compile`
+        '''
+        self.vocab = vocab
+        self.matcher = PhraseMatcher(vocab, attr='LOWER')
+        self.patterns = []
+        if patterns is not None:
+            self.add_patterns(patterns)
+
+    def add_patterns(self, patterns):
+        '''
+        Add tokenized phrases.
+
+        :param patterns: iterable of (label, name, list of words)
+        '''
+        by_key = {}
+        for label, name, words in patterns:
+            self.patterns.append((label, name, words))
+            by_key.setdefault(f'{label}|{name}', []).append(
+                Doc(self.vocab, words=words))
+        for key, docs in by_key.items():
+            self.matcher.add(key, None, *docs)
+
+    @classmethod
+    def compile(cls, nlp, phrases=None):
+        '''
+        Build the component from phrases, tokenized by `nlp`.
+
+        :param nlp: object of `spacy.language.Language`
+        :param phrases: iterable of (label, phrase), all gazetteers if None
+        '''
+        # universities are in two files
+        phrases = list(dict.fromkeys(
+            gazetteer_phrases() if phrases is None else phrases))
+        docs = nlp.tokenizer.pipe(phrase for _, phrase in phrases)
+        return cls(nlp.vocab, (
+            (label, phrase, [token.text for token in doc])
+            for (label, phrase), doc in zip(phrases, docs) if len(doc)))
+
+    def __call__(self, doc):
+        matches = []
+        for match_id, start, end in self.matcher(doc):
+            label, name = self.vocab.strings[match_id].split('|', 1)
+            if (end - start == 1 and doc[start].is_stop
+                    and label in STOP_WORD_LABELS):
+                continue
+            matches.append((label, name, start, end))
+        doc._.set(EXTENSION, matches)
+        return doc
+
+    def to_disk(self, path, **kwargs):
+        '''
+        Save the tokenized patterns and the gazetteer fingerprint.
+        '''
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, PATTERNS_FILE), 'w',
+                  encoding='utf-8') as file:
+            for label, name, words in self.patterns:
+                file.write(json.dumps([label, name, words]) + '\n')
+        with open(os.path.join(path, META_FILE), 'w') as file:
+            json.dump({'fingerprint': get_gazetteer().fingerprint(),
+                       'labels': LABELS}, file)
+
+    def from_disk(self, path, **kwargs):
+        '''
+        Load patterns saved by `to_disk`.
+        '''
+        with open(os.path.join(path, PATTERNS_FILE), encoding='utf-8') as file:
+            self.add_patterns(json.loads(line) for line in file)
+        return self
+
+
+def is_current(path):
+    '''
+    Check whether saved patterns were compiled from the current csv files
+    with the current labels.
+    '''
+    try:
+        with open(os.path.join(path, META_FILE)) as file:
+            meta = json.load(file)
+    except (OSError, ValueError):
+        return False
+    return (meta.get('fingerprint') == get_gazetteer().fingerprint()
+            and meta.get('labels') == list(LABELS))
+
+
+def add_to_pipe(nlp, path=None, **kwargs):
+    '''
+    Add the tagger to a pipeline. Patterns are loaded from `path` when
+    they are up to date with the csv files, otherwise compiled (and saved
+    to `path` if given).
+
+    :param nlp: object of `spacy.language.Language`
+    :param path: folder of saved patterns
+    :param kwargs: passed on to `nlp.add_pipe` (before, after, ...)
+    :return: the component
+    '''
+    if GazetteerTagger.name in nlp.pipe_names:
+        return nlp.get_pipe(GazetteerTagger.name)
+    if path and is_current(path):
+        component = GazetteerTagger(nlp.vocab).from_disk(path)
+    else:
+        component = GazetteerTagger.compile(nlp)
+        if path:
+            component.to_disk(path)
+    nlp.add_pipe(component, name=GazetteerTagger.name, **kwargs)
+    return component
+
+
+def matches(doc, label):
+    '''
+    Names tagged with a label in a Doc, in text order.
+
+    :param doc: object of `spacy.tokens.doc.Doc`
+    :param label: one of `LABELS`
+    :return: list of names, or None if the tagger did not run on the Doc
+    '''
+    found = doc._.get(EXTENSION)
+    if found is None:
+        return None
+    return [name for match_label, name, _, _ in found if match_label == label]
+
+
+Language.factories[GazetteerTagger.name] = (
+    lambda nlp, **cfg: GazetteerTagger(nlp.vocab))
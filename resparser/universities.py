@@ -0,0 +1,414 @@
+'''
+Index of universities: every name of the ranking and of the world list
+mapped to its rank, country and aliases. Names are found in a text with
+one automaton over all their spellings, and the ranks of many names are
+looked up at once with pandas.
+
+Mentions written differently from the csv files ('UC Berkeley', 'Univ.
+of California Berkeley', 'MIT', typos) are resolved by acronym, by name
+with abbreviations expanded, then by edit distance through a trigram
+index (see fuzzy.py).
+'''
+import re
+import threading
+from collections import Counter, namedtuple
+import pandas as pd
+from .automaton import Automaton
+from .fuzzy import TrigramIndex
+
+# rank is NaN for universities that are not ranked; aliases are the
+# other spellings that resolve to the university, acronyms included
+University = namedtuple('University', ['name', 'rank', 'country', 'aliases'])
+
+# words dropped from the start of a name to get an alias
+LEADING_WORDS = ('The ',)
+
+# abbreviations expanded before names are compared
+ABBREVIATIONS = {
+    'u': 'university', 'uni': 'university', 'univ': 'university',
+    'uc': 'university of california', 'inst': 'institute',
+    'tech': 'technology', 'coll': 'college', 'sch': 'school',
+    'sci': 'science', 'acad': 'academy', 'natl': 'national',
+    'intl': 'international', 'poly': 'polytechnic',
+}
+# words ignored when names are compared
+IGNORED_WORDS = frozenset(('the', 'at', 'in'))
+# a mention is looked up by edit distance only if it has a word
+# starting like one of these (misspellings included)
+NAME_PREFIXES = ('univ', 'inst', 'coll', 'school', 'acad', 'polyt')
+# words before the first name word that may belong to the name, e.g.
+# 'Ohio State University'
+MAX_LEADING_WORDS = 3
+# longest name in words looked up in a text
+MAX_NAME_WORDS = 12
+
+# words skipped when an acronym is made from a name
+ACRONYM_STOP_WORDS = frozenset((
+    'of', 'the', 'and', 'for', 'at', 'in', 'de', 'la', 'di', 'du', 'des',
+    'del', 'y', 'et'))
+# acronyms made from names have this many letters
+ACRONYM_LENGTH = (3, 6)
+# degrees and school levels are never read as universities
+DEGREE_ACRONYMS = frozenset((
+    'BA', 'BS', 'BE', 'MA', 'MS', 'ME', 'MD', 'MBA', 'PHD', 'BSC', 'MSC',
+    'BTECH', 'MTECH', 'SSC', 'HSC', 'CBSE', 'ICSE', 'GPA'))
+# an acronym ('MIT', 'RUN') is read only as a part of its own between
+# commas, or near one of these words
+EDUCATION_WORDS = frozenset((
+    'ba', 'bs', 'be', 'ma', 'ms', 'me', 'md', 'mba', 'phd', 'bsc', 'msc',
+    'beng', 'meng', 'btech', 'mtech', 'bachelor', 'bachelors', 'master',
+    'masters', 'doctor', 'doctorate', 'degree', 'diploma', 'graduate',
+    'graduated', 'alumni', 'alumnus', 'university', 'college',
+    'institute'))
+# words on each side of an acronym looked up for education words
+ACRONYM_CONTEXT_WORDS = 6
+
+# one edit allowed every this many characters of a mention
+FUZZY_CHARS = 8
+MAX_EDITS = 2
+
+# text between these never belongs to one name
+HARD_SPLIT = re.compile(r'[;|•·()\[\]\t\n/:]|\s[-–—]\s|\d+|\s{2,}')
+# items of a list, e.g. 'PhD, MIT, 2015'
+LIST_SPLIT = re.compile(r'[,;|•·\t\n]|\s[-–—]\s|\s{2,}')
+WORD = re.compile(r'[^\W\d_]+')
+ACRONYM_TOKEN = re.compile(r'[^\W\d_][\w-]*')
+PARENTHESES = re.compile(r'\s*\(([^()]*)\)\s*$')
+ACRONYM = re.compile(r'[A-Z][\w-]*[A-Z][\w-]*')
+
+_LOCK = threading.Lock()
+
+
+def normal_words(text):
+    '''
+    Helper function to get the words of a text as names are compared:
+    lower case, no punctuation, abbreviations expanded, a few words
+    ignored.
+
+    :return: list of words
+    '''
+    words = []
+    for word in WORD.findall(text.lower().replace('&', ' and ')):
+        if word in IGNORED_WORDS:
+            continue
+        words += ABBREVIATIONS.get(word, word).split()
+    return words
+
+
+def normalize_name(name):
+    '''
+    Helper function to get the comparison key of a university name,
+    without a trailing part in parentheses.
+    '''
+    return ' '.join(normal_words(PARENTHESES.sub('', name)))
+
+
+def name_acronyms(name):
+    '''
+    Helper function to get the acronyms of a university name: the one in
+    trailing parentheses, e.g. 'KAIST', and the initials of its words,
+    e.g. 'MIT'.
+
+    :return: list of (acronym, made from initials)
+    '''
+    acronyms = []
+    match = PARENTHESES.search(name)
+    if match and ACRONYM.fullmatch(match.group(1)):
+        acronyms.append((match.group(1), False))
+    words = [word for word in WORD.findall(PARENTHESES.sub('', name))
+             if word.lower() not in ACRONYM_STOP_WORDS]
+    initials = ''.join(word[0] for word in words).upper()
+    low, high = ACRONYM_LENGTH
+    if (initials.isascii() and low <= len(initials) <= high
+            and initials not in dict(acronyms)):
+        acronyms.append((initials, True))
+    return acronyms
+
+
+def is_name_word(word):
+    '''
+    Helper function to check whether a normalized word starts like a word
+    of university names.
+    '''
+    return word.startswith(NAME_PREFIXES)
+
+
+def name_aliases(name):
+    '''
+    Helper function to get other spellings of a university name: without
+    a trailing part in parentheses, e.g. 'Ohio State University (Main
+    campus)', and without a leading 'The'.
+
+    :param name: university name
+    :return: list of aliases, without the name itself
+    '''
+    aliases = []
+    base = name
+    if base.endswith(')') and ' (' in base:
+        base = base[:base.rindex(' (')].strip()
+        aliases.append(base)
+    for word in LEADING_WORDS:
+        if base.startswith(word):
+            aliases.append(base[len(word):])
+    return [alias for alias in dict.fromkeys(aliases)
+            if alias and alias != name]
+
+
+class UniversityIndex(object):
+    '''
+    Universities by name or alias, case-insensitive. Ranked universities
+    come first, in rank order, then the others in file order.
+    '''
+
+    def __init__(self, ranked, others=(), blocked_acronyms=()):
+        '''
+        :param ranked: iterable of (name, rank, country), in rank order
+        :param others: iterable of (name, country) of the world list,
+                       ranked or not, in file order
+        :param blocked_acronyms: upper-cased words never read as acronyms,
+                                 e.g. skills
+        '''
+        rows = {}
+        for name, rank, country in ranked:
+            rows.setdefault(name, (rank, country))
+        # upper-cased spelling -> name
+        spellings = {name.upper(): name for name in rows}
+        aliases = {name: [] for name in rows}
+        # an alias shared by two ranked universities is ambiguous
+        counts = Counter(alias.upper() for name in rows
+                         for alias in name_aliases(name))
+        for name in rows:
+            for alias in name_aliases(name):
+                key = alias.upper()
+                if counts[key] == 1 and key not in spellings:
+                    spellings[key] = name
+                    aliases[name].append(alias)
+        for name, country in others:
+            key = name.upper()
+            if key not in spellings:
+                spellings[key] = name
+                rows[name] = (float('NaN'), country)
+            elif (spellings[key] in aliases and spellings[key] != name
+                  and name not in aliases[spellings[key]]):
+                # the world list spells a ranked university differently
+                aliases[spellings[key]].append(name)
+
+        # acronyms of ranked universities, matched as whole words, never
+        # inside the automaton. An acronym written in a name wins over
+        # initials, then the best ranked university wins, e.g. 'MIT'
+        blocked = DEGREE_ACRONYMS | frozenset(blocked_acronyms)
+        found = sorted(((initials, acronym, name)
+                        for name in aliases
+                        for acronym, initials in name_acronyms(name)),
+                       key=lambda item: item[0])
+        acronyms = {}
+        for _, acronym, name in found:
+            if (acronym not in acronyms and acronym not in blocked
+                    and acronym.upper() not in spellings):
+                acronyms[acronym] = name
+                aliases[name].append(acronym)
+
+        self.universities = {
+            name: University(name, rank, country, tuple(aliases.get(name, ())))
+            for name, (rank, country) in rows.items()}
+        self.__spellings = spellings
+        self.__acronyms = acronyms
+        self.__names = None
+        self.__fuzzy = None
+        self.__order = {name: index
+                        for index, name in enumerate(self.universities)}
+        self.__keys = tuple(spellings)
+        self.matcher = Automaton(self.__keys)
+        self.__ranks = pd.Series(
+            [self.universities[name].rank for name in spellings.values()],
+            index=self.__keys, dtype=float)
+
+    def __len__(self):
+        return len(self.universities)
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+    def get(self, name):
+        '''
+        University of a name or alias, None if unknown.
+        '''
+        if not isinstance(name, str):
+            return None
+        if name in self.__acronyms:
+            return self.universities[self.__acronyms[name]]
+        name = self.__spellings.get(name.upper())
+        return None if name is None else self.universities[name]
+
+    def rank(self, name):
+        '''
+        Rank of a name or alias, NaN if not ranked or unknown.
+        '''
+        university = self.get(name)
+        return float('NaN') if university is None else university.rank
+
+    def search(self, texts):
+        '''
+        Universities whose name or an alias is contained in the texts,
+        in one pass over all of them.
+
+        :param texts: list of strings, e.g. the sentences of a section
+        :return: list of `University`, ranked ones first by rank
+        '''
+        names = set()
+        for found in self.matcher.search_many(
+                [text.upper() for text in texts]):
+            names.update(self.__spellings[self.__keys[index]]
+                         for index in found)
+        return [self.universities[name]
+                for name in sorted(names, key=self.__order.get)]
+
+    def ranks(self, names):
+        '''
+        Ranks of many names or aliases at once, as one hash join.
+
+        :param names: list of names, any case
+        :return: `numpy.ndarray` of floats, NaN if not ranked or unknown
+        '''
+        keys = pd.Series(names, dtype=object).str.upper()
+        return keys.map(self.__ranks).to_numpy(dtype=float)
+
+    def load_names(self):
+        '''
+        Comparison keys of all the names and aliases, and their trigram
+        index. Built on the first mention that is not spelled as in the
+        csv files, or ahead of time when warming up.
+        '''
+        with _LOCK:
+            if self.__names is None:
+                names = {}
+                for spelling, name in self.__spellings.items():
+                    names.setdefault(normalize_name(spelling), name)
+                names.pop('', None)
+                self.__fuzzy = TrigramIndex(names)
+                self.__names = names
+        return self.__names
+
+    def __closest(self, words):
+        '''
+        Closest name within the edit distance allowed for the words.
+
+        :return: (distance, name), None if there is none or several
+        '''
+        query = ' '.join(words)
+        max_distance = min(MAX_EDITS, len(query) // FUZZY_CHARS)
+        if not max_distance:
+            return None
+        found = self.__fuzzy.search(query, max_distance)
+        if not found:
+            return None
+        names = self.__names
+        distance = found[0][0]
+        best = {names[self.__fuzzy.strings[position]]
+                for other, position in found if other == distance}
+        return (distance, best.pop()) if len(best) == 1 else None
+
+    def __resolve_words(self, words):
+        '''
+        Names in a list of normalized words: longest exact keys first,
+        then the closest name around each name word left.
+        '''
+        names = self.load_names()
+        found = []
+        covered = set()
+        start = 0
+        while start < len(words):
+            for end in range(min(len(words), start + MAX_NAME_WORDS),
+                             start + 1, -1):
+                name = names.get(' '.join(words[start:end]))
+                if name is not None:
+                    found.append(name)
+                    covered.update(range(start, end))
+                    start = end
+                    break
+            else:
+                start += 1
+        for position, word in enumerate(words):
+            if position in covered or not is_name_word(word):
+                continue
+            if position > 0 and is_name_word(words[position - 1]):
+                continue
+            # the closest of the names starting up to a few words before
+            candidates = [
+                closest for closest in (
+                    self.__closest(words[first:])
+                    for first in range(
+                        max(0, position - MAX_LEADING_WORDS), position + 1))
+                if closest is not None]
+            if candidates:
+                found.append(min(candidates)[1])
+        return found
+
+    def resolve(self, text):
+        '''
+        University of one mention, however it is written: name or alias
+        in any case, acronym, abbreviated or misspelled name.
+
+        :param text: mention, e.g. 'UC Berkeley', 'MIT'
+        :return: `University`, or None
+        '''
+        university = self.get(text.strip())
+        if university is not None:
+            return university
+        name = self.load_names().get(' '.join(normal_words(text)))
+        if name is None:
+            closest = self.__closest(normal_words(text))
+            name = None if closest is None else closest[1]
+        return None if name is None else self.universities[name]
+
+    def __find_acronyms(self, text):
+        '''
+        Names of the acronyms in a text that are an item of a list or
+        close to an education word, e.g. not 'AUC' in 'Calculated winning
+        probabilities (AUC: 0.85)'.
+        '''
+        words = text.split()
+        found = [(position, token) for position, word in enumerate(words)
+                 for token in ACRONYM_TOKEN.findall(word)
+                 if token in self.__acronyms]
+        if not found:
+            return []
+        education = [re.sub(r'\W', '', word.lower()) in EDUCATION_WORDS
+                     for word in words]
+        parts = {part.strip() for part in LIST_SPLIT.split(text)}
+        names = []
+        for position, token in found:
+            if token in parts or any(education[
+                    max(0, position - ACRONYM_CONTEXT_WORDS):
+                    position + ACRONYM_CONTEXT_WORDS + 1]):
+                names.append(self.__acronyms[token])
+        return names
+
+    def find(self, texts, exact=True):
+        '''
+        Universities mentioned in texts however they are written: as in
+        the csv files, as acronyms, with abbreviations or other
+        punctuation, or misspelled.
+
+        :param texts: list of strings, e.g. the sentences of a section
+        :param exact: also find the names written as in the csv files,
+                      see `search`
+        :return: list of `University`, ranked ones first by rank
+        '''
+        names = set()
+        if exact:
+            names.update(college.name for college in self.search(texts))
+        for text in texts:
+            names.update(self.__find_acronyms(text))
+            for piece in HARD_SPLIT.split(text):
+                # a name may span a comma, e.g. 'University of California,
+                # Berkeley', so each part is read alone and with the next
+                parts = [normal_words(part) for part in piece.split(',')]
+                parts = [part for part in parts if part]
+                for index, part in enumerate(parts):
+                    names.update(self.__resolve_words(part))
+                    if index + 1 < len(parts):
+                        names.update(self.__resolve_words(
+                            part + parts[index + 1]))
+        return [self.universities[name]
+                for name in sorted(names, key=self.__order.get)]
@@ -2,23 +2,36 @@
 utilities for extracting all types of resume information
 '''
 import io
+import json
 import os
 import re
+from bisect import bisect_left
 from time import time
 from datetime import datetime
 from functools import wraps
-import pandas as pd
+from collections import namedtuple
+import numpy
 import docx2txt
 from dateutil import relativedelta
-from pdfminer.converter import TextConverter
-from pdfminer.pdfinterp import PDFPageInterpreter
-from pdfminer.pdfinterp import PDFResourceManager
-from pdfminer.layout import LAParams
 from pdfminer.pdfpage import PDFPage
 from pdfminer.pdfparser import PDFSyntaxError
 import textract
+from spacy.attrs import LEMMA, TAG, HEAD, DEP, ENT_IOB, ENT_TYPE
+from spacy.tokens import Doc
 
 from . import constants as cs
+from . import pdf
+from . import planning
+from . import ruler
+from .gazetteer import get_gazetteer
+from .ngrams import normalize
+
+# text of a resume file, with its number of pages and metadata when the
+# format has them
+Document = namedtuple('Document', ['text', 'no_of_pages', 'metadata'])
+
+EMAIL_REGEX = re.compile(cs.EMAIL)
+MOBILE_NUMBER_REGEX = re.compile(cs.MOBILE_NUMBER)
 
 
 def timer(func):
@@ -36,6 +49,32 @@ def timer(func):
     return wrapper
 
 
+def jsonable(data):
+    '''
+    Helper function to turn extracted data into plain JSON types, e.g. to
+    send it between processes. spaCy spans become strings.
+
+    :param data: dictionary from `ResumeParser.get_extracted_data`
+    :return: dictionary
+    '''
+    return json.loads(json.dumps(data, default=str))
+
+
+def read_pdf(pdf_path, parallel_threshold=pdf.PARALLEL_PAGE_THRESHOLD,
+             processes=None):
+    '''
+    Helper function to read a .pdf file in a single pass: the text of
+    every page, the number of pages and the document information.
+
+    :param pdf_path: path to PDF file, bytes, `io.BytesIO` or `mmap.mmap`
+    :param parallel_threshold: split documents with more pages than this
+                               across processes; never if None
+    :param processes: size of the process pool, cpu count if None
+    :return: `pdf.PdfContent`; `no_of_pages` is None if the file is broken
+    '''
+    return pdf.read_pdf(pdf_path, parallel_threshold, processes)
+
+
 def extract_text_from_pdf(pdf_path):
     '''
     Helper function to extract the plain text from .pdf files
@@ -43,68 +82,7 @@ def extract_text_from_pdf(pdf_path):
     :param pdf_path: path to PDF file to be extracted (remote or local)
     :return: iterator of string of extracted text
     '''
-    # https://www.blog.pythonlibrary.org/2018/05/03/exporting-data-from-pdfs-with-python/
-    if not isinstance(pdf_path, io.BytesIO):
-        # extract text from local pdf file
-        with open(pdf_path, 'rb') as pdffile:
-            try:
-                for page in PDFPage.get_pages(
-                        pdffile,
-                        caching=True,
-                        check_extractable=True
-                ):
-                    resource_manager = PDFResourceManager()
-                    fake_file_handle = io.StringIO()
-                    converter = TextConverter(
-                        resource_manager,
-                        fake_file_handle,
-                        codec='utf-8',
-                        laparams=LAParams()
-                    )
-                    page_interpreter = PDFPageInterpreter(
-                        resource_manager,
-                        converter
-                    )
-                    page_interpreter.process_page(page)
-
-                    text = fake_file_handle.getvalue()
-                    yield text
-
-                    # close open handles
-                    converter.close()
-                    fake_file_handle.close()
-            except PDFSyntaxError:
-                return
-    else:
-        # extract text from remote pdf file
-        try:
-            for page in PDFPage.get_pages(
-                    pdf_path,
-                    caching=True,
-                    check_extractable=True
-            ):
-                resource_manager = PDFResourceManager()
-                fake_file_handle = io.StringIO()
-                converter = TextConverter(
-                    resource_manager,
-                    fake_file_handle,
-                    codec='utf-8',
-                    laparams=LAParams()
-                )
-                page_interpreter = PDFPageInterpreter(
-                    resource_manager,
-                    converter
-                )
-                page_interpreter.process_page(page)
-
-                text = fake_file_handle.getvalue()
-                yield text
-
-                # close open handles
-                converter.close()
-                fake_file_handle.close()
-        except PDFSyntaxError:
-            return
+    return pdf.iter_pages(pdf_path)
 
 
 def get_number_of_pages(file_name):
@@ -172,6 +150,19 @@ def extract_text_from_doc(doc_path):
         return ' '
 
 
+def get_extension(file_path):
+    '''
+    Helper function to get the extension of a resume file
+
+    :param file_path: path of the file or `io.BytesIO` with a name
+    :return: extension such as '.pdf'
+    '''
+    if isinstance(file_path, io.BytesIO):
+        file_path = file_path.name
+    ext = os.path.splitext(file_path)[1][1:]
+    return '.' + ext
+
+
 def extract_text(file_path, extension):
     '''
     Wrapper function to detect the file extension and call text
@@ -180,30 +171,59 @@ def extract_text(file_path, extension):
     :param file_path: path of file of which text is to be extracted
     :param extension: extension of file `file_name`
     '''
+    return extract_document(file_path, extension).text
+
+
+def extract_document(file_path, extension,
+                     parallel_threshold=pdf.PARALLEL_PAGE_THRESHOLD,
+                     processes=None):
+    '''
+    Wrapper function to extract the text of a file, plus its number of
+    pages and metadata for .pdf files, opening the file only once
+
+    :param file_path: path of file or `io.BytesIO`
+    :param extension: extension of file `file_name`
+    :param parallel_threshold: see `read_pdf`
+    :param processes: see `read_pdf`
+    :return: `Document`
+    '''
     text = ''
     if extension == '.pdf':
-        for page in extract_text_from_pdf(file_path):
+        content = read_pdf(file_path, parallel_threshold, processes)
+        for page in content.pages:
             text += ' ' + page
+        return Document(text, content.no_of_pages, content.metadata)
     elif extension == '.docx':
         text = extract_text_from_docx(file_path)
     elif extension == '.doc':
         text = extract_text_from_doc(file_path)
-    return text
+    return Document(text, None, {})
 
 
-def extract_entity_sections(text_raw):
+def extract_entity_sections(text_raw, offsets=False):
     '''
     Helper function to extract all the raw text from sections of
     resume specifically for graduates and undergraduates
 
     :param text: Raw text of resume
+    :param offsets: if True, give (start, end) character offsets of each
+                    line in the whitespace-normalized text
+                    (`' '.join(text_raw.split())`) instead of the line
     :return: dictionary of entities
     '''
     text_split = [i.strip() for i in text_raw.split('\n')]
     # sections_in_resume = [i for i in text_split if i.lower() in sections]
     sections = {'beginning': []}
     key = False
+    cursor = 0
     for phrase in text_split:
+        if offsets:
+            start = cursor
+            if phrase:
+                cursor += len(' '.join(phrase.split())) + 1
+            line = (start, cursor - 1)
+        else:
+            line = phrase
         if len(phrase) == 1:
             p_key = phrase
         else:
@@ -214,12 +234,12 @@ def extract_entity_sections(text_raw):
             pass
 
         if not p_key and not key and phrase.strip():
-            sections['beginning'].append(phrase)
+            sections['beginning'].append(line)
         elif p_key in cs.RESUME_SECTIONS_GRAD:
             sections[p_key] = []
             key = p_key
         elif key and phrase.strip():
-            sections[key].append(phrase)
+            sections[key].append(line)
     return sections
 
 
@@ -233,12 +253,108 @@ def extract_section_text(section_title, sections):
 
     return text of the section
     '''
+    return '\n'.join(extract_section_lines(section_title, sections))
+
+
+def extract_section_lines(section_title, sections):
+    '''
+    Helper function to collect the lines (or line offsets) of each
+    section including profile, experience, skills, education
+
+    :param section_title: string of the section title
+    :param sections: dictionary from `extract_entity_sections`
+
+    return list of lines of the section
+    '''
     section_list = cs.SECTION_NAMELIST[section_title]
     text_section = []
     for section_name in section_list:
         if section_name in sections.keys():
             text_section += sections[section_name]
-    return '\n'.join(text_section)
+    return text_section
+
+
+def token_indices(nlp_text, offsets):
+    '''
+    Helper function to map character offsets to token indices.
+
+    :param nlp_text: object of `spacy.tokens.doc.Doc`
+    :param offsets: list of (start, end) character offsets
+    :return: list of indices of tokens starting inside the offsets
+    '''
+    starts = [token.idx for token in nlp_text]
+    indices = []
+    for start, end in offsets:
+        indices += range(bisect_left(starts, start), bisect_left(starts, end))
+    return indices
+
+
+def doc_from_tokens(nlp_text, indices, parse=True):
+    '''
+    Helper function to build a new Doc from some tokens of a parsed Doc,
+    keeping tags, entities and (optionally) the dependency parse, so
+    that parts of a document can be used without running the pipeline
+    again.
+
+    :param nlp_text: object of `spacy.tokens.doc.Doc`
+    :param indices: sorted list of token indices to keep
+    :param parse: keep the dependency parse (needed for sentences and
+                  noun chunks)
+    :return: object of `spacy.tokens.doc.Doc`
+    '''
+    indices = list(indices)
+    position = {i: n for n, i in enumerate(indices)}
+    words = [nlp_text[i].text for i in indices]
+    spaces = [bool(nlp_text[i].whitespace_) or (
+        i + 1 not in position and n + 1 < len(indices))
+              for n, i in enumerate(indices)]
+    doc = Doc(nlp_text.vocab, words=words, spaces=spaces)
+    parse = parse and nlp_text.is_parsed
+    if not indices:
+        doc.is_tagged = nlp_text.is_tagged
+        doc.is_parsed = parse
+        return doc
+
+    attrs = [LEMMA, ENT_IOB, ENT_TYPE]
+    if nlp_text.is_tagged:
+        attrs.append(TAG)
+    if parse:
+        attrs += [HEAD, DEP]
+    array = nlp_text.to_array(attrs)[indices]
+
+    # entities cut by a gap start again with a B tag
+    iob = attrs.index(ENT_IOB)
+    for n, i in enumerate(indices):
+        if array[n, iob] == 1 and (n == 0 or indices[n - 1] != i - 1):
+            array[n, iob] = 3
+
+    # heads outside the kept tokens become roots
+    if parse:
+        root = nlp_text.vocab.strings.add('ROOT')
+        heads = []
+        for n, i in enumerate(indices):
+            head = position.get(nlp_text[i].head.i)
+            if head is None:
+                heads.append(0)
+                array[n, attrs.index(DEP)] = root
+            else:
+                heads.append(head - n)
+        array[:, attrs.index(HEAD)] = numpy.array(
+            heads, dtype='int64').view('uint64')
+    doc.from_array(attrs, array)
+    return doc
+
+
+def section_doc(nlp_text, offsets):
+    '''
+    Helper function to get the Doc of one section from the Doc of the
+    whole (whitespace-normalized) resume text.
+
+    :param nlp_text: object of `spacy.tokens.doc.Doc`
+    :param offsets: list of (start, end) offsets of the section lines
+    :return: object of `spacy.tokens.doc.Doc`
+    '''
+    return doc_from_tokens(nlp_text, token_indices(nlp_text, offsets))
 
 
 def extract_entities_form_model(custom_nlp_text):
@@ -329,31 +445,69 @@ def get_number_of_months_from_dates(date1, date2):
     return months_of_experience
 
 
+def first_match(regex, text):
+    '''
+    Helper function to get the first item `re.findall` would return,
+    without scanning the rest of the text
+
+    :param regex: compiled regular expression
+    :param text: string
+    :return: string, tuple of strings with several groups, or None
+    '''
+    match = regex.search(text)
+    if match is None:
+        return None
+    if regex.groups == 0:
+        return match.group(0)
+    if regex.groups == 1:
+        return match.group(1)
+    return match.groups('')
+
+
 def extract_email(text):
     '''
     Helper function to extract email id from text
 
     :param text: plain text extracted from resume file
     '''
-    email = re.findall(r"([^@|\s]+@[^@]+\.[^@|\s]+)", text)
+    email = first_match(EMAIL_REGEX, text)
     if email:
         try:
-            return email[0].split()[0].strip(';')
+            return email.split()[0].strip(';')
         except IndexError:
             return None
 
 
-def preprocess(nlp_text, nlp):
+def preprocess(nlp_text, nlp, components=None):
     '''
     Preprocess nlp text
 
     :param nlp_text: object of `spacy.tokens.doc.Doc`
     :param nlp: spacy model
+    :param components: only run these pipeline components, see
+                       `planning.run`; run the whole pipeline if None
 
     return `spacy.tokens.doc.Doc`
     '''
     text = [w.text for w in nlp_text if not w.is_stop and not w.is_punct]
-    return nlp(' '.join(text))
+    if components is None:
+        return nlp(' '.join(text))
+    return planning.run(nlp, ' '.join(text), components)
+
+
+def preprocess_section(nlp_text, offsets):
+    '''
+    Same as `preprocess` for one section of a parsed Doc, but reuses its
+    tags and entities instead of running the pipeline again.
+
+    :param nlp_text: object of `spacy.tokens.doc.Doc`
+    :param offsets: list of (start, end) offsets of the section lines
+
+    return `spacy.tokens.doc.Doc` without dependency parse
+    '''
+    indices = [i for i in token_indices(nlp_text, offsets)
+               if not nlp_text[i].is_stop and not nlp_text[i].is_punct]
+    return doc_from_tokens(nlp_text, indices, parse=False)
 
 
 def extract_name(nlp_text, matcher):
@@ -403,20 +557,12 @@ def extract_company_name(nlp_text):
     :param nlp_text: 'spacy.tokens.doc.Doc'
     :return list of company names
     '''
-
-    college_df = pd.read_csv(
-        os.path.join(os.path.dirname(__file__), 'world-universities.csv')
-    )
-    colleges = [college.upper() for college in list(college_df.name)]
-
-    skills_df = pd.read_csv(
-        os.path.join(os.path.dirname(__file__), 'skills.csv')
-    )
-    skills = [skill.upper() for skill in list(skills_df.columns.values)]
+    # upper-cased colleges and skills
+    excluded = get_gazetteer().non_company_upper
 
     companies = []
     for ent in nlp_text.ents:
-        if ent.label_ == 'ORG' and str(ent).upper() not in colleges + skills:
+        if ent.label_ == 'ORG' and str(ent).upper() not in excluded:
             companies.append(ent)
     return companies
 
@@ -429,14 +575,11 @@ def extract_mobile_number(text, custom_regex=None):
     :return: string of extracted mobile numbers
     '''
     if not custom_regex:
-        mob_num_regex = r".*?(\(?\d{3}\D{0,3}\d{3}\D{0,3}\d{4}).*?"
-#         mob_num_regex = r'''(\d{3}[-\.\s]??\d{3}[-\.\s]??\d{4}|\(\d{3}\)
-#                         [-\.\s]*\d{3}[-\.\s]??\d{4}|\d{3}[-\.\s]??\d{4})'''
-        phone = re.findall(re.compile(mob_num_regex), text)
+        phone = first_match(MOBILE_NUMBER_REGEX, text)
     else:
-        phone = re.findall(re.compile(custom_regex), text)
+        phone = first_match(re.compile(custom_regex), text)
     if phone:
-        number = ''.join(phone[0])
+        number = ''.join(phone)
         return number
 
 
@@ -446,28 +589,33 @@ def extract_skills(nlp_text, noun_chunks, skills_file=None):
 
     :param nlp_text: object of `spacy.tokens.doc.Doc`
     :param noun_chunks: noun chunks extracted from nlp text
+    :param skills_file: path of a custom skills csv
     :return: list of skills extracted
     '''
-    tokens = [token.text for token in nlp_text if not token.is_stop]
-    if not skills_file:
-        data = pd.read_csv(
-            os.path.join(os.path.dirname(__file__), 'skills.csv')
-        )
-    else:
-        data = pd.read_csv(skills_file)
-    skills = list(data.columns.values)
-    skillset = []
-    # check for one-grams
-    for token in tokens:
-        if token.lower() in skills:
-            skillset.append(token)
-
-    # check for bi-grams and tri-grams
-    for token in noun_chunks:
-        token = token.text.lower().strip()
-        if token in skills:
-            skillset.append(token)
-    return [i.capitalize() for i in set([i.lower() for i in skillset])]
+    # tagged while parsing, see ruler.py
+    tagged = None if skills_file else ruler.matches(nlp_text, ruler.SKILL)
+    if tagged is not None:
+        return [i.capitalize() for i in set(tagged)]
+    skills = get_gazetteer().get_skill_index(skills_file)
+    return [i.capitalize() for i in find_phrases(skills, nlp_text,
+                                                 noun_chunks)]
+
+
+def find_phrases(index, nlp_text, noun_chunks):
+    '''
+    Helper function to find the phrases of an n-gram index in a text
+
+    :param index: `ngrams.NgramIndex`
+    :param nlp_text: object of `spacy.tokens.doc.Doc`
+    :param noun_chunks: noun chunks extracted from nlp text, for phrases
+                        longer than the n-gram windows
+    :return: set of normalized phrases
+    '''
+    found = {phrase for _, _, phrase in index.find(nlp_text)}
+    for chunk in noun_chunks:
+        if chunk.text in index:
+            found.add(normalize(chunk.text))
+    return found
 
 
 def cleanup(token, lower=True):
@@ -487,27 +635,13 @@ def extract_designation(nlp_text, noun_chunks):
     :param noun_chunks
     :return list of desinations
     '''
-
-    title_df = pd.read_csv(
-        os.path.join(os.path.dirname(__file__), 'jobtitles.csv')
-    )
-
-    titles = list(title_df.Title.values)
-    titles = [title.lower() for title in titles]
-    tokens = [token.text for token in nlp_text if not token.is_stop]
-
-    titleset = []
-    # check for one-grams
-    for token in tokens:
-        if token.lower() in titles:
-            titleset.append(token)
-
-    # check for bi-grams and tri-grams
-    for token in noun_chunks:
-        token = token.text.lower().strip()
-        if token in titles:
-            titleset.append(token)
-    return [i.capitalize() for i in set([i.lower() for i in titleset])]
+    # tagged while parsing, see ruler.py
+    tagged = ruler.matches(nlp_text, ruler.TITLE)
+    if tagged is not None:
+        return [i.capitalize() for i in set(tagged)]
+    titles = get_gazetteer().title_index
+    return [i.capitalize() for i in find_phrases(titles, nlp_text,
+                                                 noun_chunks)]
 
 
 def extract_degree(nlp_text_sents):
@@ -530,60 +664,40 @@ def extract_degree(nlp_text_sents):
         pass
 
     # Extract major & year
-    majors_df = pd.read_csv(
-        os.path.join(os.path.dirname(__file__), 'majorslist.csv')
-    )
-    majors = list(majors_df.Major)
+    majors = get_gazetteer().major_matcher
 
     education = []
     for key in edu:
-        major = [major for major in majors if major in edu[key].upper()]
+        major = majors.first(edu[key].upper())
         year = re.search(re.compile(cs.YEAR), edu[key])
 
         edu_info = [key]
         if major:
-            edu_info.append(major[0])
+            edu_info.append(major)
         if year:
             edu_info.append(''.join(year.group(0)))
         education.append(' '.join(edu_info))
     return education
 
 
-def extract_college_name(nlp_text_sents):
+def extract_college_name(nlp_text_sents, nlp_text=None):
     '''
     Helper function to extract college names
 
     :param nlp_text_sents: 'spacy.tokens.doc.Doc' for one section text
+    :param nlp_text: Doc of the same text, its tagged universities are
+                     used if the gazetteer tagger ran (see ruler.py)
     :return dictionary of college ranks
     '''
-
-    data_ranks = pd.read_csv(
-        os.path.join(os.path.dirname(__file__),
-                     'World_University_Rank_2020.csv')
-    )
-
-    colleges = list(data_ranks.University)  # colleges with rank
-    college_name_rank = {}
-    collegeset = []
-    for sent in nlp_text_sents:
-        collegeset += [college for college in colleges if college.upper()
-                       in sent.upper()]
-
-    # [i.capitalize() for i in set([i.lower() for i in collegeset])]
-    for name in collegeset:
-        college_name_rank[name] = int(
-            data_ranks.loc[data_ranks['University'] == name, 'Score_Rank'])
-
-    # find college without rank
-    data = pd.read_csv(
-        os.path.join(os.path.dirname(__file__), 'world-universities.csv')
-    )
-    colleges_full = list(data.name)  # full list of colleges
-    collegeset2 = []
-    for sent in nlp_text_sents:
-        collegeset2 += [college for college in colleges_full if college.upper()
-                        in sent.upper()]
-    for name in collegeset2:
-        if name not in collegeset:
-            college_name_rank[name] = float('NaN')
-    return college_name_rank
+    index = get_gazetteer().university_index
+    sents = [str(sent) for sent in nlp_text_sents]
+    tagged = None if nlp_text is None else ruler.matches(
+        nlp_text, ruler.UNIVERSITY)
+    if tagged is not None:
+        colleges = [index.get(name) for name in tagged]
+        # acronyms, abbreviated and misspelled names
+        colleges += index.find(sents, exact=False)
+    else:
+        colleges = index.find(sents)
+    return {college.name: college.rank
+            for college in colleges if college is not None}
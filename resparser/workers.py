@@ -0,0 +1,138 @@
+'''
+Long-lived pool of warm worker processes. Each worker loads the spaCy
+models and the gazetteers once, then serves jobs until it is recycled.
+'''
+import atexit
+import multiprocessing as mp
+import threading
+from . import gazetteer
+from . import models
+
+# recycle a worker after this many jobs, to cap memory growth
+MAX_TASKS_PER_CHILD = 500
+
+_LOCK = threading.Lock()
+_SHARED = None
+
+
+def init_worker():
+    '''
+    Pool initializer. Load models and gazetteers once per worker.
+    '''
+    models.warm_up()
+    gazetteer.warm_up()
+
+
+class WorkerPool(object):
+    '''
+    Wrapper of `multiprocessing.Pool` whose workers are warmed up when
+    they start. The pool is created on first use and accepts jobs until
+    it is closed.
+    '''
+
+    def __init__(self, processes=None, maxtasksperchild=MAX_TASKS_PER_CHILD,
+                 initializer=init_worker, initargs=()):
+        '''
+        :param processes: number of workers, cpu count if None
+        :param maxtasksperchild: jobs before a worker is replaced by a
+                                 fresh (warm) one, never if None
+        :param initializer: function run once in every new worker
+        '''
+        self.processes = processes or mp.cpu_count()
+        self.maxtasksperchild = maxtasksperchild
+        self.initializer = initializer
+        self.initargs = initargs
+        self.__pool = None
+        self.__lock = threading.Lock()
+
+    @property
+    def pool(self):
+        '''
+        Underlying `multiprocessing.Pool`, started on first access.
+        '''
+        if self.__pool is None:
+            with self.__lock:
+                if self.__pool is None:
+                    self.__pool = mp.Pool(
+                        self.processes,
+                        initializer=self.initializer,
+                        initargs=self.initargs,
+                        maxtasksperchild=self.maxtasksperchild)
+        return self.__pool
+
+    def submit(self, func, *args, **kwargs):
+        '''
+        Queue one job.
+
+        :return: `multiprocessing.pool.AsyncResult`
+        '''
+        return self.pool.apply_async(func, args, kwargs)
+
+    def map(self, func, iterable, chunksize=1):
+        '''
+        Run a function over an iterable, results in order.
+        '''
+        return self.pool.map(func, iterable, chunksize)
+
+    def imap(self, func, iterable, chunksize=1):
+        '''
+        Lazy `map`, results in order.
+        '''
+        return self.pool.imap(func, iterable, chunksize)
+
+    def imap_unordered(self, func, iterable, chunksize=1):
+        '''
+        Lazy `map`, results as soon as they are ready.
+        '''
+        return self.pool.imap_unordered(func, iterable, chunksize)
+
+    def close(self):
+        '''
+        Wait for queued jobs and stop the workers.
+        '''
+        with self.__lock:
+            if self.__pool is not None:
+                self.__pool.close()
+                self.__pool.join()
+                self.__pool = None
+
+    def terminate(self):
+        '''
+        Stop the workers without waiting for queued jobs.
+        '''
+        with self.__lock:
+            if self.__pool is not None:
+                self.__pool.terminate()
+                self.__pool.join()
+                self.__pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def get_pool():
+    '''
+    Get the process-wide shared pool, created on first use.
+    '''
+    global _SHARED
+    with _LOCK:
+        if _SHARED is None:
+            _SHARED = WorkerPool()
+        return _SHARED
+
+
+def shutdown():
+    '''
+    Stop the shared pool.
+    '''
+    global _SHARED
+    with _LOCK:
+        pool, _SHARED = _SHARED, None
+    if pool is not None:
+        pool.terminate()
+
+
+atexit.register(shutdown)
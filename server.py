@@ -0,0 +1,374 @@
+'''
+Local HTTP service for the resume parser.
+
+    python server.py --port 8000
+
+POST /parse with a PDF/DOCX file, either as the raw request body (file
+name in the `X-Filename` header or `?filename=`) or as multipart form
+data. The response is the JSON of `get_extracted_data()`. Concurrent
+requests are grouped into micro-batches for `nlp.pipe`.
+
+Uploads larger than `--max-body` bytes get 413, and files not parsed
+within `--timeout` seconds get 504.
+
+GET /health and GET /metrics report status and latency.
+'''
+import argparse
+import io
+import json
+import os
+import threading
+import time
+from collections import deque
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.client import HTTPConnection
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from queue import Queue, Empty
+from urllib.parse import urlparse, parse_qs
+from resparser import ResumeParser, gazetteer, models
+from resparser.instrument import percentile
+from resparser.utils import jsonable
+
+EXTENSIONS = ('.pdf', '.docx')
+
+# largest accepted request body, in bytes
+MAX_BODY_BYTES = 20 * 1024 * 1024
+
+# seconds a request waits for its result
+REQUEST_TIMEOUT = 120
+
+
+class Job(object):
+    '''
+    One uploaded file waiting for its result.
+    '''
+
+    def __init__(self, data, name):
+        self.stream = io.BytesIO(data)
+        self.stream.name = os.path.basename(name)
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class Metrics(object):
+    '''
+    Request counters and recent latencies.
+    '''
+
+    def __init__(self, window=1000):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.batched_docs = 0
+        self.latencies = deque(maxlen=window)
+
+    def record(self, seconds, error=False):
+        '''
+        Record one finished request.
+        '''
+        with self.lock:
+            self.requests += 1
+            self.errors += int(error)
+            self.latencies.append(seconds)
+
+    def record_batch(self, size):
+        '''
+        Record one micro-batch.
+        '''
+        with self.lock:
+            self.batches += 1
+            self.batched_docs += size
+
+    def summary(self):
+        '''
+        Metrics as a dictionary.
+        '''
+        with self.lock:
+            latencies = list(self.latencies)
+            batches = self.batches
+            summary = {
+                'uptime': round(time.time() - self.started, 3),
+                'requests': self.requests,
+                'errors': self.errors,
+                'batches': batches,
+                'mean_batch_size': (round(self.batched_docs / batches, 2)
+                                    if batches else 0),
+            }
+        for name, pct in (('p50', 50), ('p95', 95), ('p99', 99)):
+            value = percentile(latencies, pct)
+            summary[f'latency_{name}'] = (round(value, 4)
+                                          if value is not None else None)
+        return summary
+
+
+class MicroBatcher(object):
+    '''
+    Group concurrent jobs into batches for `ResumeParser.parse_many`.
+    A batch is run when `max_batch` jobs are waiting or the first one
+    has waited `max_wait` seconds.
+    '''
+
+    def __init__(self, metrics, max_batch=8, max_wait=0.05, **options):
+        self.metrics = metrics
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.options = options
+        self.queue = Queue()
+        self.thread = threading.Thread(target=self.__loop, daemon=True)
+        self.thread.start()
+
+    def submit(self, job):
+        '''
+        Queue a job, see `Job.done` for its result.
+        '''
+        self.queue.put(job)
+
+    def __loop(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.queue.get(
+                        timeout=max(0, deadline - time.time())))
+                except Empty:
+                    break
+            self.metrics.record_batch(len(batch))
+            self.__run(batch)
+
+    def __run(self, batch):
+        try:
+            results = list(ResumeParser.parse_many(
+                [job.stream for job in batch], batch_size=len(batch),
+                **self.options))
+            for job, result in zip(batch, results):
+                job.result = jsonable(result)
+        except Exception:  # pylint: disable=broad-except
+            # find the broken file(s) one by one
+            for job in batch:
+                try:
+                    job.result = jsonable(ResumeParser(
+                        job.stream, **self.options).get_extracted_data())
+                except Exception as error:  # pylint: disable=broad-except
+                    job.error = error
+        for job in batch:
+            job.done.set()
+
+
+class ParserHandler(BaseHTTPRequestHandler):
+    '''
+    Request handler, see the module docstring.
+    '''
+    server_version = 'ResumeParser/1.0'
+
+    def __send_json(self, status, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        '''
+        Health and metrics.
+        '''
+        path = urlparse(self.path).path
+        if path == '/health':
+            self.__send_json(200, {
+                'status': 'ok',
+                'models': {name: models.is_loaded(name) for name in
+                           (models.DEFAULT_MODEL, models.CUSTOM_MODEL)},
+            })
+        elif path == '/metrics':
+            self.__send_json(200, self.server.metrics.summary())
+        else:
+            self.__send_json(404, {'error': 'not found'})
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        '''
+        Parse one uploaded file.
+        '''
+        start_time = time.time()
+        url = urlparse(self.path)
+        if url.path != '/parse':
+            self.__send_json(404, {'error': 'not found'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            length = -1
+        if length < 0 or length > self.server.max_body:
+            # the body is not read, so the connection cannot be reused
+            self.close_connection = True
+            self.server.metrics.record(time.time() - start_time, error=True)
+            if length < 0:
+                self.__send_json(400, {'error': 'invalid Content-Length'})
+            else:
+                self.__send_json(413, {
+                    'error': f'file larger than {self.server.max_body} bytes'})
+            return
+        body = self.rfile.read(length)
+        name, data = self.__upload(body, parse_qs(url.query))
+        if not name or not name.lower().endswith(EXTENSIONS):
+            self.server.metrics.record(time.time() - start_time, error=True)
+            self.__send_json(415, {'error': 'send a .pdf or .docx file'})
+            return
+
+        job = Job(data, name.lower())
+        self.server.batcher.submit(job)
+        if not job.done.wait(self.server.request_timeout):
+            # the batch still runs, its result is dropped
+            self.server.metrics.record(time.time() - start_time, error=True)
+            self.__send_json(504, {'error': 'parsing timed out'})
+            return
+        self.server.metrics.record(time.time() - start_time,
+                                   error=job.error is not None)
+        if job.error is not None:
+            self.__send_json(422, {'error': str(job.error)})
+        else:
+            self.__send_json(200, job.result)
+
+    def __upload(self, body, query):
+        '''
+        File name and content from a raw or multipart request body.
+        '''
+        content_type = self.headers.get('Content-Type', '')
+        if content_type.startswith('multipart/form-data'):
+            message = BytesParser(policy=HTTP).parsebytes(
+                b'Content-Type: ' + content_type.encode('latin-1')
+                + b'\r\n\r\n' + body)
+            for part in message.iter_parts():
+                if part.get_filename():
+                    return part.get_filename(), part.get_content()
+            return None, None
+        name = self.headers.get('X-Filename') or query.get(
+            'filename', [None])[0]
+        return name, body
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class ParserServer(ThreadingHTTPServer):
+    '''
+    HTTP server holding warm models, a micro-batcher and metrics.
+    '''
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 8000), max_batch=8,
+                 max_wait=0.05, verbose=True, max_body=MAX_BODY_BYTES,
+                 request_timeout=REQUEST_TIMEOUT, **options):
+        '''
+        :param max_body: largest accepted request body, in bytes
+        :param request_timeout: seconds a request waits for its result
+        :param options: `ResumeParser` options
+        '''
+        models.warm_up()
+        gazetteer.warm_up()
+        self.metrics = Metrics()
+        self.batcher = MicroBatcher(self.metrics, max_batch, max_wait,
+                                    **options)
+        self.verbose = verbose
+        self.max_body = max_body
+        self.request_timeout = request_timeout
+        super().__init__(address, ParserHandler)
+
+
+class LocalClient(object):
+    '''
+    Run a server on a free local port in a background thread and talk to
+    it over HTTP, e.g. for tests. Works fully offline.
+    '''
+
+    def __init__(self, **server_options):
+        server_options.setdefault('verbose', False)
+        self.server = ParserServer(('127.0.0.1', 0), **server_options)
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       daemon=True)
+        self.thread.start()
+
+    def __request(self, method, path, body=None, headers=None):
+        conn = HTTPConnection(*self.server.server_address[:2], timeout=300)
+        try:
+            conn.request(method, path, body=body, headers=headers or {})
+            response = conn.getresponse()
+            return response.status, json.loads(response.read())
+        finally:
+            conn.close()
+
+    def parse(self, file_path):
+        '''
+        Upload a file.
+
+        :return: tuple of (HTTP status, JSON response)
+        '''
+        with open(file_path, 'rb') as file:
+            return self.__request('POST', '/parse', file.read(),
+                                  {'X-Filename': os.path.basename(file_path)})
+
+    def health(self):
+        '''
+        GET /health.
+        '''
+        return self.__request('GET', '/health')
+
+    def metrics(self):
+        '''
+        GET /metrics.
+        '''
+        return self.__request('GET', '/metrics')
+
+    def close(self):
+        '''
+        Stop the server.
+        '''
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    '''
+    Main function.
+    '''
+    args = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    args.add_argument('--host', default='127.0.0.1')
+    args.add_argument('--port', type=int, default=8000)
+    args.add_argument('--max-batch', type=int, default=8,
+                      help='most files parsed in one nlp.pipe batch')
+    args.add_argument('--max-wait', type=float, default=0.05,
+                      help='seconds to wait for a batch to fill up')
+    args.add_argument('--max-body', type=int, default=MAX_BODY_BYTES,
+                      help='largest accepted upload, in bytes')
+    args.add_argument('--timeout', type=float, default=REQUEST_TIMEOUT,
+                      help='seconds allowed to parse one upload')
+    args.add_argument('--single-pass', action='store_true',
+                      help='parse each resume with one pipeline run')
+    args = args.parse_args()
+
+    server = ParserServer((args.host, args.port), args.max_batch,
+                          args.max_wait, max_body=args.max_body,
+                          request_timeout=args.timeout,
+                          single_pass=args.single_pass)
+    print(f'Serving on http://{args.host}:{args.port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
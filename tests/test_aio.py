@@ -0,0 +1,119 @@
+import asyncio
+import threading
+import pytest
+
+pytest.importorskip('spacy')
+
+from resparser import aio  # noqa: E402
+
+
+class FakePool(object):
+    '''
+    Stands for `multiprocessing.Pool`: jobs are completed by the test,
+    from another thread like the pool result handler.
+    '''
+
+    def __init__(self):
+        self.jobs = []
+
+    def apply_async(self, func, args, callback, error_callback):
+        self.jobs.append((args, callback, error_callback))
+
+
+class FakeWorkerPool(object):
+    processes = 2
+
+    def __init__(self):
+        self.pool = FakePool()
+
+
+def complete(callback, value):
+    thread = threading.Thread(target=callback, args=(value,))
+    thread.start()
+    thread.join()
+
+
+def test_bytes_without_name():
+    parser = aio.AsyncResumeParser(pool=FakeWorkerPool())
+    with pytest.raises(ValueError):
+        asyncio.run(parser.parse(b'%PDF-1.4'))
+    assert parser.pool.pool.jobs == []
+
+
+def test_path_read_off_the_loop(tmp_path):
+    parser = aio.AsyncResumeParser(pool=FakeWorkerPool())
+    path = tmp_path / 'cv.pdf'
+    path.write_bytes(b'data')
+
+    async def run():
+        task = asyncio.ensure_future(parser.parse(str(path)))
+        while not parser.pool.pool.jobs:
+            await asyncio.sleep(0.01)
+        args, callback, _ = parser.pool.pool.jobs[0]
+        complete(callback, ({}, {}, None))
+        await task
+        return args[:2]
+
+    assert asyncio.run(run()) == (b'data', str(path))
+
+
+def test_result_from_pool_thread():
+    parser = aio.AsyncResumeParser(pool=FakeWorkerPool())
+    emitted = []
+
+    def sink(*args):
+        emitted.append(args)
+
+    async def run():
+        task = asyncio.ensure_future(parser.parse(b'data', name='cv.pdf'))
+        while not parser.pool.pool.jobs:
+            await asyncio.sleep(0)
+        args, callback, _ = parser.pool.pool.jobs[0]
+        assert args[:2] == (b'data', 'cv.pdf')
+        complete(callback, ({'name': 'Jane Doe'}, {'total': 0.1}, None))
+        return await task
+
+    aio.instrument.add_sink(sink)
+    try:
+        assert asyncio.run(run()) == {'name': 'Jane Doe'}
+    finally:
+        aio.instrument.remove_sink(sink)
+    # timings of the worker are sent to the sinks of this process
+    assert emitted == [('cv.pdf', {'total': 0.1}, None)]
+
+
+def test_error_from_pool_thread():
+    parser = aio.AsyncResumeParser(pool=FakeWorkerPool())
+
+    async def run():
+        task = asyncio.ensure_future(parser.parse(b'data', name='cv.pdf'))
+        while not parser.pool.pool.jobs:
+            await asyncio.sleep(0)
+        complete(parser.pool.pool.jobs[0][2], KeyError('broken'))
+        return await task
+
+    with pytest.raises(KeyError):
+        asyncio.run(run())
+
+
+def test_timed_out_job_keeps_its_slot():
+    parser = aio.AsyncResumeParser(pool=FakeWorkerPool(), max_concurrency=1)
+
+    async def run():
+        with pytest.raises(asyncio.TimeoutError):
+            await parser.parse(b'data', name='cv.pdf', timeout=0.01)
+        assert parser.semaphore.locked()
+        complete(parser.pool.pool.jobs[0][1], ({}, {}, None))
+        await asyncio.sleep(0.01)
+        assert not parser.semaphore.locked()
+
+    asyncio.run(run())
+
+
+def test_closed_loop_does_not_raise():
+    loop = asyncio.new_event_loop()
+    future = loop.create_future()
+    loop.close()
+    # would stop the pool result thread if it raised
+    aio._call_in_loop(loop, aio._set_result, future, {})
+    assert not future.done()
@@ -0,0 +1,46 @@
+import random
+from resparser.automaton import Automaton
+
+
+def test_search_examples():
+    automaton = Automaton(['HE', 'SHE', 'HIS', 'HERS', ''])
+    assert automaton.search('USHERS') == [0, 1, 3]
+    assert automaton.first('USHERS') == 'HE'
+    assert automaton.first('XYZ') is None
+    assert len(automaton) == 5
+
+
+def test_overlapping_matches():
+    automaton = Automaton(['AA', 'A'])
+    assert list(automaton.iter_matches('AAA')) == [
+        (1, 1), (2, 0), (2, 1), (3, 0), (3, 1)]
+
+
+def test_search_matches_brute_force():
+    rnd = random.Random(0)
+    for _ in range(500):
+        patterns = [''.join(rnd.choice('abc')
+                            for _ in range(rnd.randint(1, 4)))
+                    for _ in range(rnd.randint(1, 20))]
+        text = ''.join(rnd.choice('abc') for _ in range(rnd.randint(0, 30)))
+        automaton = Automaton(patterns)
+        assert automaton.search(text) == [
+            index for index, pattern in enumerate(patterns)
+            if pattern in text]
+
+
+def test_search_many_never_matches_across_texts():
+    automaton = Automaton(['AB', 'B', 'C'])
+    assert automaton.search_many(['A', 'BC', '', 'AB']) == [
+        [], [1, 2], [], [0, 1]]
+
+
+def test_search_many_matches_search():
+    rnd = random.Random(1)
+    patterns = ['COMPUTER SCIENCE', 'SCIENCE', 'ECONOMICS', 'NURSING']
+    automaton = Automaton(patterns)
+    words = ['COMPUTER', 'SCIENCE', 'ECONOMICS', 'NURSING', 'ART']
+    texts = [' '.join(rnd.choice(words) for _ in range(rnd.randint(0, 4)))
+             for _ in range(100)]
+    assert automaton.search_many(texts) == [
+        automaton.search(text) for text in texts]
@@ -0,0 +1,68 @@
+import io
+import os
+import pytest
+
+pytest.importorskip('spacy')
+
+from resparser import cache  # noqa: E402
+from resparser.utils import Document  # noqa: E402
+
+RESUME_DIR = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'resume')
+RESUME = os.path.join(RESUME_DIR, sorted(os.listdir(RESUME_DIR))[0])
+
+
+def test_content_hash_path_and_stream():
+    with open(RESUME, 'rb') as file:
+        stream = io.BytesIO(file.read())
+    assert cache.content_hash(RESUME) == cache.content_hash(stream)
+
+
+def test_options_key_skips_defaults():
+    assert cache.options_key() == cache.options_key(
+        single_pass=False, fields=None, custom_regex=None)
+    assert cache.options_key() != cache.options_key(single_pass=True)
+    assert cache.options_key(fields=('email',)) != cache.options_key()
+
+
+def test_put_get_round_trip(tmp_path):
+    results = cache.ResultCache(str(tmp_path / 'results.sqlite'))
+    key = results.key(RESUME, single_pass=True)
+    document = Document('text', 2, {'Author': 'Jane Doe'})
+    assert results.get(key) is None
+    results.put(key, {'name': 'Jane Doe', 'skills': ['Python']}, document)
+    assert results.get(key) == {'name': 'Jane Doe', 'skills': ['Python']}
+    assert results.get_document(key) == document
+    assert results.get(results.key(RESUME)) is None
+
+
+def test_document_shared_across_options(tmp_path):
+    results = cache.ResultCache(str(tmp_path / 'results.sqlite'))
+    document = Document('text', 1, {})
+    results.put(results.key(RESUME, single_pass=True), {'a': 1}, document)
+    # the document only depends on the content
+    other = results.key(RESUME, fields=('email',))
+    assert results.get(other) is None
+    assert results.get_document(other) == document
+    assert results.get_document(('other content', other[1])) is None
+
+
+def test_eviction(tmp_path):
+    results = cache.ResultCache(str(tmp_path / 'results.sqlite'),
+                                max_entries=2)
+    keys = [('content%d' % i, 'options') for i in range(3)]
+    for key in keys:
+        results.put(key, {'i': key[0]})
+    assert results.get(keys[0]) is None
+    assert results.get(keys[2]) == {'i': 'content2'}
+
+
+def test_parser_result_found_by_lookup(tmp_path):
+    from resparser.resume_parser import ResumeParser
+    results = cache.ResultCache(str(tmp_path / 'results.sqlite'))
+    assert results.lookup(RESUME) is None
+    data = ResumeParser(RESUME, cache=results).get_extracted_data()
+    assert results.lookup(RESUME) is not None
+    assert results.lookup(RESUME, fields='regex') is None
+    cached = ResumeParser(RESUME, cache=results).get_extracted_data()
+    assert cached['email'] == data['email']
@@ -0,0 +1,74 @@
+import pytest
+from resparser import compiled
+
+
+def make_table(strings, values=None):
+    buffer = bytearray()
+    entry = compiled._write_table(buffer, strings, values)
+    return compiled.StringTable(bytes(buffer), entry)
+
+
+def test_string_table_round_trip():
+    strings = ['Python', 'C++', 'Ångström', '', 'java', 'Java']
+    table = make_table(strings, list(range(len(strings))))
+    assert len(table) == len(strings)
+    assert list(table.in_file_order()) == strings
+    assert list(table) == sorted(strings, key=lambda s: s.encode('utf-8'))
+    assert list(table.items()) == [(string, index)
+                                   for index, string in enumerate(strings)]
+    for index, string in enumerate(strings):
+        assert string in table
+        assert table.get(string) == index
+    assert 'python' not in table
+    assert table.get('Go', -1) == -1
+    assert table.find(float('nan')) == -1
+    assert list(table.prefixed('J')) == ['Java']
+
+
+def test_string_table_tuple_values():
+    table = make_table(['b', 'a'], [(2, 0), (1, 1)])
+    assert list(table.items()) == [('b', (2, 0)), ('a', (1, 1))]
+
+
+def test_empty_table():
+    table = make_table([])
+    assert len(table) == 0
+    assert 'a' not in table
+    assert list(table.items()) == []
+
+
+def test_build_round_trip(tmp_path):
+    pytest.importorskip('pandas')
+    from resparser.gazetteer import DATA_DIR, Gazetteer
+    from resparser.ngrams import normalize
+    path = compiled.build(str(tmp_path / compiled.FILE_NAME))
+    gazetteer = Gazetteer(DATA_DIR, use_compiled=False)
+    compiled_file = compiled.CompiledGazetteer(path)
+    assert compiled_file.is_current(DATA_DIR)
+    assert (list(compiled_file.table(compiled.SKILLS).in_file_order())
+            == list(gazetteer.skills))
+    assert (set(compiled_file.table(compiled.TITLES))
+            == {normalize(title) for title in gazetteer.titles})
+    assert (list(compiled_file.table(compiled.MAJORS).in_file_order())
+            == list(dict.fromkeys(gazetteer.majors)))
+    countries = [country if isinstance(country, str) else None
+                 for country in compiled_file.header['countries']]
+    assert [(name, rank, countries[country]) for name, (rank, country)
+            in compiled_file.table(compiled.RANKED_UNIVERSITIES).items()] == [
+        (name, rank, country if isinstance(country, str) else None)
+        for name, rank, country in gazetteer.ranked_university_rows]
+    # the first row of a name wins
+    universities = {}
+    for name, country in gazetteer.university_rows:
+        universities.setdefault(
+            name, country if isinstance(country, str) else None)
+    assert [(name, countries[country]) for name, country
+            in compiled_file.table(compiled.UNIVERSITIES).items()] == list(
+        universities.items())
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / 'other.bin'
+    path.write_bytes(b'not a gazetteer')
+    with pytest.raises(ValueError):
+        compiled.CompiledGazetteer(str(path))
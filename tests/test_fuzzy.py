@@ -0,0 +1,73 @@
+import random
+from resparser import fuzzy
+
+
+def reference_distance(first, second):
+    '''
+    Optimal string alignment distance, full table.
+    '''
+    table = [[0] * (len(second) + 1) for _ in range(len(first) + 1)]
+    for row in range(len(first) + 1):
+        table[row][0] = row
+    for column in range(len(second) + 1):
+        table[0][column] = column
+    for row in range(1, len(first) + 1):
+        for column in range(1, len(second) + 1):
+            cost = first[row - 1] != second[column - 1]
+            table[row][column] = min(table[row - 1][column] + 1,
+                                     table[row][column - 1] + 1,
+                                     table[row - 1][column - 1] + cost)
+            if (row > 1 and column > 1
+                    and first[row - 1] == second[column - 2]
+                    and first[row - 2] == second[column - 1]):
+                table[row][column] = min(table[row][column],
+                                         table[row - 2][column - 2] + 1)
+    return table[-1][-1]
+
+
+def random_string(rnd, alphabet='abcde', longest=12):
+    return ''.join(rnd.choice(alphabet)
+                   for _ in range(rnd.randint(0, longest)))
+
+
+def test_trigrams():
+    assert fuzzy.trigrams('mit') == {' mi', 'mit', 'it '}
+    assert fuzzy.trigrams('') == set()
+
+
+def test_edit_distance_examples():
+    assert fuzzy.edit_distance('oxford', 'oxford', 2) == 0
+    assert fuzzy.edit_distance('oxford', 'oxfrod', 2) == 1
+    assert fuzzy.edit_distance('oxford', 'oxfd', 2) == 2
+    assert fuzzy.edit_distance('oxford', 'cambridge', 2) == 3
+    assert fuzzy.edit_distance('', 'ab', 2) == 2
+
+
+def test_edit_distance_matches_reference():
+    rnd = random.Random(0)
+    for _ in range(3000):
+        first, second = random_string(rnd), random_string(rnd)
+        bound = rnd.randint(0, 3)
+        expected = min(reference_distance(first, second), bound + 1)
+        assert fuzzy.edit_distance(first, second, bound) == expected, (
+            first, second, bound)
+
+
+def test_search_matches_brute_force():
+    rnd = random.Random(1)
+    for _ in range(300):
+        strings = [random_string(rnd) for _ in range(50)]
+        index = fuzzy.TrigramIndex(strings)
+        query = random_string(rnd)
+        bound = rnd.randint(0, 2)
+        expected = sorted(
+            (reference_distance(query, string), position)
+            for position, string in enumerate(strings)
+            if reference_distance(query, string) <= bound)
+        assert index.search(query, bound) == expected, (query, bound)
+
+
+def test_search_short_query_without_shared_trigram():
+    # two swaps change every trigram of the query
+    index = fuzzy.TrigramIndex(['acbdegfh', 'zzzzzzzz'])
+    assert index.search('abcdefgh', 2) == [(2, 0)]
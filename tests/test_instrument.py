@@ -0,0 +1,97 @@
+import time
+from resparser import instrument
+
+
+def test_percentile_nearest_rank():
+    values = [15, 20, 35, 40, 50]
+    assert instrument.percentile([], 50) is None
+    assert instrument.percentile(values, 5) == 15
+    assert instrument.percentile(values, 30) == 20
+    assert instrument.percentile(values, 40) == 20
+    assert instrument.percentile(values, 50) == 35
+    assert instrument.percentile(values, 100) == 50
+    assert instrument.percentile([3, 1, 2], 0) == 1
+
+
+def test_nested_stages_are_exclusive():
+    timings = instrument.Timings()
+    with timings.stage('outer'):
+        time.sleep(0.02)
+        with timings.stage('inner'):
+            time.sleep(0.05)
+    assert timings.timings['inner'] >= 0.05
+    assert 0.02 <= timings.timings['outer'] < 0.05
+    total = timings.finish()[instrument.TOTAL]
+    assert total >= timings.timings['outer'] + timings.timings['inner']
+
+
+def test_repeated_stage_adds_up():
+    timings = instrument.Timings()
+    for _ in range(3):
+        timings.call('stage', time.sleep, 0.01)
+    assert timings.timings['stage'] >= 0.03
+
+
+def test_allocations_of_nested_stages():
+    timings = instrument.Timings(allocations=True)
+    with timings.stage('outer'):
+        with timings.stage('inner'):
+            kept = bytearray(1 << 20)
+    assert timings.allocations['inner'] >= 1 << 20
+    assert timings.allocations['outer'] < 1 << 20
+    del kept
+
+
+def test_failing_sink_is_logged(caplog):
+    received = []
+
+    def failing(*args):
+        raise ValueError('down')
+
+    def sink(*args):
+        received.append(args)
+
+    instrument.add_sink(failing)
+    instrument.add_sink(sink)
+    try:
+        instrument.emit('cv.pdf', {'total': 1.0})
+    finally:
+        instrument.remove_sink(failing)
+        instrument.remove_sink(sink)
+    assert received == [('cv.pdf', {'total': 1.0}, None)]
+    assert 'metrics sink' in caplog.text
+
+
+def test_muted():
+    received = []
+
+    def sink(*args):
+        received.append(args)
+
+    instrument.add_sink(sink)
+    try:
+        with instrument.muted():
+            instrument.emit('cv.pdf', {'total': 1.0})
+        instrument.emit('cv.pdf', {'total': 2.0})
+    finally:
+        instrument.remove_sink(sink)
+    assert received == [('cv.pdf', {'total': 2.0}, None)]
+
+
+def test_summarize():
+    summary = instrument.summarize(
+        [{'total': seconds} for seconds in (1, 2, 3, 4)] + [{'nlp:text': 1}])
+    assert summary['total'] == {'count': 4, 'mean': 2.5, 'p50': 2, 'p95': 4}
+    assert summary['nlp:text']['count'] == 1
+
+
+def test_timing_stats_memory_is_bounded():
+    stats = instrument.TimingStats(reservoir=100, seed=0)
+    for seconds in range(10000):
+        stats.add({'total': seconds})
+    summary = stats.summary()['total']
+    assert summary['count'] == 10000
+    assert summary['mean'] == 4999.5
+    assert len(stats.samples['total']) == 100
+    # a uniform sample, so the median is roughly right
+    assert 3000 < summary['p50'] < 7000
@@ -0,0 +1,70 @@
+from collections import namedtuple
+from resparser.ngrams import NgramIndex, normalize
+
+Token = namedtuple('Token', ['text', 'whitespace_', 'is_space', 'is_stop'])
+
+STOP_WORDS = {'a', 'in', 'and', 'it'}
+
+
+def tokenize(text):
+    '''
+    Tokens of a text split on spaces, '-' and '.' kept as tokens.
+    '''
+    tokens = []
+    for word in text.split(' '):
+        parts = []
+        for part in word.replace('-', ' - ').replace('.', ' . ').split():
+            parts.append(part)
+        for position, part in enumerate(parts):
+            space = ' ' if position == len(parts) - 1 else ''
+            tokens.append(Token(part, space, False,
+                                part.lower() in STOP_WORDS))
+    return tokens
+
+
+def find(index, text):
+    return [phrase for _, _, phrase in index.find(tokenize(text))]
+
+
+def test_normalize():
+    assert normalize('  Machine   LEARNING ') == 'machine learning'
+
+
+def test_index_skips_empty_and_non_strings():
+    index = NgramIndex(['Python', ' ', float('nan'), 'Machine Learning'])
+    assert len(index) == 2
+    assert 'PYTHON' in index
+    assert 'machine  learning' in index
+
+
+def test_find_phrases_up_to_max_ngram():
+    index = NgramIndex(['python', 'machine learning',
+                        'natural language processing',
+                        'one two three four five'])
+    assert find(index, 'Python and Machine Learning in '
+                       'Natural Language Processing') == [
+        'python', 'machine learning', 'natural language processing']
+    # five words, longer than the windows
+    assert find(index, 'one two three four five') == []
+
+
+def test_find_keeps_spaces_of_the_text():
+    index = NgramIndex(['django-rest-framework', 'node.js', 'c'])
+    assert find(index, 'I used Django-REST-framework and Node.js') == [
+        'django-rest-framework', 'node.js']
+
+
+def test_single_stop_words_are_skipped():
+    index = NgramIndex(['it', 'it security', 'a'])
+    assert find(index, 'it security and a plan') == ['it security']
+
+
+def test_from_normalized():
+    index = NgramIndex.from_normalized(frozenset({'sql', 'data science'}))
+    assert find(index, 'SQL for Data Science') == ['sql', 'data science']
+
+
+def test_find_positions():
+    index = NgramIndex(['machine learning'])
+    assert index.find(tokenize('Deep machine learning')) == [
+        (1, 3, 'machine learning')]
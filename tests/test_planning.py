@@ -0,0 +1,55 @@
+import pytest
+from resparser import planning
+
+
+def test_resolve():
+    assert planning.resolve() == planning.ALL_FIELDS
+    assert planning.resolve('regex') == planning.REGEX_FIELDS
+    # always in the order of ALL_FIELDS
+    assert planning.resolve(['skills', 'name']) == ('name', 'skills')
+    with pytest.raises(ValueError):
+        planning.resolve(['salary'])
+
+
+def test_resolve_one_field_by_name():
+    assert planning.resolve('email') == ('email',)
+    assert planning.plan('email') == planning.plan(['email'])
+
+
+def test_resolve_unknown_name():
+    with pytest.raises(ValueError, match='regex'):
+        planning.resolve('salary')
+
+
+def test_regex_profile_only_tokenizes():
+    assert planning.plan('regex') == {}
+    assert not planning.uses('regex', planning.TEXT)
+    assert not planning.uses('regex', planning.CUSTOM)
+
+
+def test_plan_per_stage():
+    stages = planning.plan(['college_name'])
+    assert stages == {planning.EDUCATION: {planning.PARSER},
+                      planning.TEXT: {planning.PARSER}}
+    stages = planning.plan(['college_name'], single_pass=True)
+    assert stages == {planning.TEXT: {planning.PARSER}}
+    assert planning.needs(planning.plan(), planning.CUSTOM, planning.NER)
+
+
+def test_ruler_only_when_used():
+    assert not any(planning.RULER in components
+                   for components in planning.plan().values())
+    stages = planning.plan(['college_name', 'email'], use_ruler=True)
+    assert planning.RULER in stages[planning.EDUCATION]
+    assert planning.RULER in stages[planning.TEXT]
+    assert planning.plan(['email'], use_ruler=True) == {}
+
+
+class FakeNlp(object):
+    pipe_names = ['tagger', 'parser', 'ner', planning.RULER, 'custom']
+
+
+def test_disabled_keeps_custom_components():
+    assert planning.disabled(FakeNlp(), {planning.PARSER}) == [
+        'tagger', 'ner', planning.RULER]
+    assert planning.disabled(FakeNlp(), set(FakeNlp.pipe_names)) == []
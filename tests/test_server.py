@@ -0,0 +1,76 @@
+import io
+import os
+import sys
+import time
+import pytest
+
+pytest.importorskip('spacy')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+import server  # noqa: E402
+from resparser import utils  # noqa: E402
+
+RESUME_DIR = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'resume')
+RESUME = os.path.join(RESUME_DIR, 'Kormulev_short_CV.pdf')
+
+
+def test_get_extension():
+    assert utils.get_extension('cv.pdf') == '.pdf'
+    assert utils.get_extension('my.cv.v2.docx') == '.docx'
+    assert utils.get_extension('./resume/cv.pdf') == '.pdf'
+    stream = io.BytesIO(b'')
+    stream.name = 'jane.doe.pdf'
+    assert utils.get_extension(stream) == '.pdf'
+
+
+def test_metrics_summary():
+    metrics = server.Metrics()
+    for seconds in (0.1, 0.2, 0.3, 0.4):
+        metrics.record(seconds)
+    metrics.record(1.0, error=True)
+    metrics.record_batch(3)
+    summary = metrics.summary()
+    assert summary['requests'] == 5
+    assert summary['errors'] == 1
+    assert summary['mean_batch_size'] == 3
+    assert summary['latency_p50'] == 0.3
+
+
+@pytest.fixture(scope='module')
+def client():
+    with server.LocalClient() as local:
+        yield local
+
+
+def test_parse(client):
+    status, data = client.parse(RESUME)
+    assert status == 200
+    assert data['no_of_pages'] == 1
+    status, metrics = client.metrics()
+    assert status == 200 and metrics['requests'] >= 1
+
+
+def test_wrong_extension(client, tmp_path):
+    path = tmp_path / 'cv.txt'
+    path.write_bytes(b'text')
+    assert client.parse(str(path))[0] == 415
+
+
+def test_body_too_large(tmp_path):
+    path = tmp_path / 'large.pdf'
+    path.write_bytes(b'0' * 2048)
+    with server.LocalClient(max_body=1024) as local:
+        assert local.parse(str(path))[0] == 413
+
+
+def test_timeout(monkeypatch, tmp_path):
+    with server.LocalClient(request_timeout=0.1) as local:
+        # a batch that never finishes
+        monkeypatch.setattr(local.server.batcher, 'submit',
+                            lambda job: None)
+        start = time.time()
+        assert local.parse(RESUME)[0] == 504
+        assert time.time() - start < 5
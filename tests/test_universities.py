@@ -0,0 +1,107 @@
+import math
+import pytest
+
+pytest.importorskip('pandas')
+
+from resparser import universities  # noqa: E402
+from resparser.universities import UniversityIndex  # noqa: E402
+
+RANKED = [
+    ('Massachusetts Institute of Technology (MIT)', 1, 'United States'),
+    ('Stanford University', 2, 'United States'),
+    ('University of California, Berkeley', 4, 'United States'),
+    ('University of California, Los Angeles (UCLA)', 15, 'United States'),
+    ('Korea Advanced Institute of Science & Technology (KAIST)', 40,
+     'South Korea'),
+    ('The Ohio State University (Main campus)', 80, 'United States'),
+    ('Radboud University Nijmegen', 120, 'Netherlands'),
+]
+OTHERS = [
+    ('Stanford University', 'United States'),
+    ('Universidad de los Andes', 'Colombia'),
+]
+
+
+@pytest.fixture(scope='module')
+def index():
+    return UniversityIndex(RANKED, OTHERS, blocked_acronyms=('SQL',))
+
+
+def names(found):
+    return [university.name for university in found]
+
+
+def test_name_acronyms():
+    assert universities.name_acronyms(RANKED[0][0]) == [
+        ('MIT', False)]
+    assert universities.name_acronyms('Radboud University Nijmegen') == [
+        ('RUN', True)]
+
+
+def test_name_aliases():
+    assert universities.name_aliases(
+        'The Ohio State University (Main campus)') == [
+        'The Ohio State University', 'Ohio State University']
+
+
+def test_normal_words():
+    assert universities.normal_words('Univ. of California & Co') == [
+        'university', 'of', 'california', 'and', 'co']
+
+
+def test_get_by_name_alias_and_acronym(index):
+    assert len(index) == 8
+    assert index.get('stanford university').rank == 2
+    assert index.get('Ohio State University').rank == 80
+    assert index.get('MIT').name == RANKED[0][0]
+    assert index.get('KAIST').country == 'South Korea'
+    assert index.get('mit') is None
+    assert math.isnan(index.rank('Universidad de los Andes'))
+    assert math.isnan(index.rank('Unknown College'))
+
+
+def test_ranks(index):
+    ranks = index.ranks(['University of California, Los Angeles',
+                         'stanford university', 'nowhere'])
+    assert list(ranks[:2]) == [15, 2]
+    assert math.isnan(ranks[2])
+
+
+@pytest.mark.parametrize('mention, rank', [
+    ('MIT', 1),
+    ('UCLA', 15),
+    ('Univ. of California Berkeley', 4),
+    ('UC Berkeley', 4),
+    ('Massachusets Institute of Tecnology', 1),
+    ('Stanfrod University', 2),
+    ('University of California, Los Angelos', 15),
+])
+def test_resolve(index, mention, rank):
+    assert index.resolve(mention).rank == rank
+
+
+def test_resolve_unknown(index):
+    assert index.resolve('Springfield Community Center') is None
+    # too short to be read by edit distance
+    assert index.resolve('Stanfrd') is None
+
+
+def test_find(index):
+    assert names(index.find(
+        ['BS in Computer Science, Univ. of California, Berkeley',
+         'MBA - Stanfrod University; exchange at KAIST'])) == [
+        RANKED[1][0], RANKED[2][0], RANKED[4][0]]
+
+
+def test_acronyms_need_an_education_context(index):
+    assert names(index.find(['We RUN the team'])) == []
+    assert names(index.find(['Master of Science, RUN'])) == [RANKED[6][0]]
+    assert names(index.find(['Nijmegen, RUN, 2015'])) == [RANKED[6][0]]
+    assert names(index.find(['PhD (MIT)'])) == [RANKED[0][0]]
+    # acronyms written in the name too
+    assert names(index.find(['Worked with MIT'])) == []
+    assert names(index.find(['Calculated scores (MIT: 0.85)'])) == []
+    # education words too far away
+    assert names(index.find(
+        ['Stanford University alumni, then built tools for clients and '
+         'partners of many teams (MIT: 0.85)'])) == [RANKED[1][0]]